@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+#Benchmarks of the hot paths of the project: building and simulating networks (simulation), writing and reading observations (observationsIO), and the information-theoretic analysis (new_it_analyzer).
+#Run it as a standalone command, for example:
+#    python benchmarks.py --output benchmark_results.json
+#    python benchmarks.py --baseline benchmark_results.json --output new_results.json
+#The results are written as JSON together with the environment (python, numpy, brian2 and dit versions, cpu, git commit), and compared to the results of a previous run given as a baseline: a benchmark is flagged as a regression if it is more than 'tolerance' slower than in the baseline, in which case the command exits with status 1. A baseline run with other numbers of trials, duration, sizes or connection types is not compared, and the command exits with status 2.
+#The default numbers of trials and of repetitions are chosen so that the whole suite runs in a few minutes on a laptop, use --trials and --io-trials to make it heavier.
+
+
+#Runs 'function' 'repeat' times and returns the timings in seconds. 'setup' is run before each repetition and is not timed, its result is given to 'function'.
+def time_function(function, repeat=3, setup=None):
+    timings = []
+    for repetition in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        if setup is not None:
+            function(argument)
+        else:
+            function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def summary(timings, **info):
+    return dict(info, seconds=min(timings), median=float(np.median(timings)), timings=timings)
+
+def module_version(name):
+    try:
+        return __import__(name).__version__
+    except Exception:
+        return None
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': sys.version, 'platform': platform.platform(), 'processor': platform.processor(), 'cpu_count': os.cpu_count(),
+            'numpy': module_version('numpy'), 'scipy': module_version('scipy'), 'brian2': module_version('brian2'), 'dit': module_version('dit'),
+            'git_commit': commit, 'date': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+#The connections of the networks that are simulated. The torus types need a perfect square number of neurons and are skipped otherwise.
+def connections(con_type, nb_neurons):
+    import gen_connections
+    cycle = int(round(np.sqrt(nb_neurons)))
+    if con_type in ['torus', 'simplex_torus'] and cycle*cycle != nb_neurons:
+        return None
+    if con_type == 'simplex_torus':
+        return gen_connections.simplex_torus(cycle, cycle)
+    return gen_connections.generate_connections(con_type, nb_neurons)
+
+def benchmark_simulation(sizes, con_types, trials, duration, repeat):
+    import simulation
+    results = {}
+    for nb_neurons in sizes:
+        pre_syn, pos_syn = connections('simplex', nb_neurons)
+        #the first build of a model includes the code generation (and compilation, unless it is already in the cache), the following ones only the build. The network of a single copy is only built when it is first needed, hence the call to single_network.
+        results['simulation_init/first/{}'.format(nb_neurons)] = summary(time_function(lambda: simulation.Simulation(nb_neurons, 10, 50, pre_syn, pos_syn, 'bench', duration=duration).single_network(), repeat=1), nb_neurons=nb_neurons)
+        results['simulation_init/{}'.format(nb_neurons)] = summary(time_function(lambda: simulation.Simulation(nb_neurons, 10, 50, pre_syn, pos_syn, 'bench', duration=duration).single_network(), repeat=repeat), nb_neurons=nb_neurons)
+        for con_type in con_types:
+            connection = connections(con_type, nb_neurons)
+            if connection is None:
+                continue
+            for batched in [False, True]:
+                name = 'simulate/{}/{}/{}'.format(con_type, nb_neurons, 'batched' if batched else 'sequential')
+                print(name)
+                timings = time_function(lambda ex: ex.simulate(trials, None, batched=batched), repeat=repeat,
+                                        setup=lambda: simulation.Simulation(nb_neurons, 10, 50, connection[0], connection[1], 'bench', duration=duration, seed=0))
+                results[name] = summary(timings, nb_neurons=nb_neurons, con_type=con_type, trials=trials, nb_synapses=len(connection[0]))
+    return results
+
+#Observations of independent neurons, with a stimulus in variable 0 and neurons that fire 0, 1 or 2 times per bin, which is typical of a 50ms bin.
+def synthetic_observations(nb_bins, nb_trials, nb_neurons, seed=0):
+    generator = np.random.default_rng(seed)
+    stimulus = np.repeat((np.arange(nb_bins) % 4 == 1)[:, None, None], nb_trials, axis=1)
+    spikes = generator.binomial(2, 0.2, size=(nb_bins, nb_trials, nb_neurons)) + stimulus*generator.binomial(1, 0.5, size=(nb_bins, nb_trials, nb_neurons))
+    return np.concatenate([stimulus, spikes], axis=2).astype(np.int64)
+
+def benchmark_io(observations, path_to_dir, repeat):
+    import observationsIO
+    path_to_text = os.path.join(path_to_dir, 'observations')
+    path_to_binary = os.path.join(path_to_dir, 'observations.obs')
+    info = {'shape': list(observations.shape)}
+    as_lists = observations.tolist()
+    results = {}
+    results['io/write_text'] = summary(time_function(lambda: observationsIO.write_observations(as_lists, path_to_text), repeat=repeat), **info)
+    results['io/write_text']['bytes'] = os.path.getsize(path_to_text)
+    results['io/read_text'] = summary(time_function(lambda: observationsIO.read_observations(path_to_text), repeat=repeat), **info)
+    results['io/write_binary'] = summary(time_function(lambda: observationsIO.write_observations_binary(observations, path_to_binary), repeat=repeat), **info)
+    results['io/write_binary']['bytes'] = os.path.getsize(path_to_binary)
+    results['io/read_binary'] = summary(time_function(lambda: np.array(observationsIO.read_observation_array(path_to_binary)), repeat=repeat), **info)
+    return results, path_to_binary
+
+#The measures of the experiments of generate_experiments: the NMI between the stimulus and each neuron, the NCMI between pairs of neurons given the stimulus, and the PID of pairs of neurons about a third one.
+def benchmark_analysis(path_to_file, nb_neurons, backends, repeat):
+    import new_it_analyzer
+    neurons = list(range(1, nb_neurons+1))
+    pairs = [([i], [j]) for i in neurons for j in neurons if i < j][:20]
+    triples = [([i], [j], [k]) for (i,), (j,) in pairs for k in neurons[:3] if k not in [i, j]][:10]
+    results = {}
+    for backend in backends:
+        new_analyzer = lambda: new_it_analyzer.IT_analyzer(path_to_file, stim='on', backend=backend)
+        results['it/{}/init'.format(backend)] = summary(time_function(new_analyzer, repeat=repeat))
+        #a new analyzer for each repetition, so that nothing is served from the entropy cache of a previous one.
+        results['it/{}/NMI'.format(backend)] = summary(time_function(lambda analyzer: [analyzer.NMIs([0], [neuron]) for neuron in neurons], repeat=repeat, setup=new_analyzer), nb_measures=len(neurons))
+        results['it/{}/NCMI'.format(backend)] = summary(time_function(lambda analyzer: [analyzer.NCMIs(X, Y, [0]) for X, Y in pairs], repeat=repeat, setup=new_analyzer), nb_measures=len(pairs))
+        results['it/{}/PID'.format(backend)] = summary(time_function(lambda analyzer: analyzer.PIDs(triples), repeat=repeat, setup=new_analyzer), nb_measures=len(triples))
+    return results
+
+#The parameters that change the work done by the benchmarks: runs that differ on one of them cannot be compared.
+WORKLOAD_PARAMETERS = ['trials', 'duration', 'io_trials', 'io_neurons', 'sizes', 'con_types']
+
+def workload_differences(results, baseline):
+    return {name: (baseline['parameters'].get(name), results['parameters'].get(name)) for name in WORKLOAD_PARAMETERS
+            if baseline.get('parameters', {}).get(name) != results['parameters'].get(name)}
+
+#Compares the results to a baseline (the results of a previous run) and returns the list of the benchmarks that are more than 'tolerance' slower. Benchmarks that are slower by less than 'min_difference' seconds are not flagged, as the timings of very short benchmarks are mostly noise.
+#If the two runs were made with different workload parameters (see WORKLOAD_PARAMETERS), nothing is compared and None is returned.
+def compare(results, baseline, tolerance, min_difference=0.005):
+    differences = workload_differences(results, baseline)
+    if len(differences) > 0:
+        print('The baseline was run with other parameters, so it is not compared: ' + ', '.join('{} is {} in the baseline and {} now'.format(name, *values) for name, values in differences.items()))
+        return None
+    regressions = []
+    print('{:<50} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline (s)', 'current (s)', 'ratio'))
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['seconds']/baseline['results'][name]['seconds'] if baseline['results'][name]['seconds'] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance and result['seconds'] - baseline['results'][name]['seconds'] > min_difference:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:<50} {:>12.4f} {:>12.4f} {:>8.2f}{}'.format(name, baseline['results'][name]['seconds'], result['seconds'], ratio, flag))
+    return regressions
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of the simulation, I/O and information-theoretic analysis.')
+    parser.add_argument('--output', default='benchmark_results.json', help='the JSON file in which the results are written.')
+    parser.add_argument('--baseline', default=None, help='the JSON results of a previous run to compare to.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='relative slowdown above which a benchmark is flagged as a regression.')
+    parser.add_argument('--min-difference', type=float, default=0.005, help='absolute slowdown in seconds below which a benchmark is never flagged as a regression.')
+    parser.add_argument('--suites', nargs='+', default=['simulation', 'io', 'analysis'], choices=['simulation', 'io', 'analysis'])
+    parser.add_argument('--sizes', nargs='+', type=int, default=[3, 20, 100, 200], help='numbers of neurons of the simulated networks.')
+    parser.add_argument('--con-types', nargs='+', default=['disconnected', 'simplex', 'full_no_loops', 'torus'])
+    parser.add_argument('--trials', type=int, default=10, help='number of Monte Carlo trials of each simulation.')
+    parser.add_argument('--duration', type=int, default=1000, help='duration of each trial in ms.')
+    parser.add_argument('--io-trials', type=int, default=1000, help='number of trials of the observations that are written, read and analyzed.')
+    parser.add_argument('--io-neurons', type=int, default=20, help='number of neurons of the observations that are written, read and analyzed.')
+    parser.add_argument('--backends', nargs='+', default=['numpy', 'dit'], help='backends of IT_analyzer.')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions of each benchmark (the minimum is reported).')
+    options = parser.parse_args(arguments)
+
+    results = {'environment': environment(), 'parameters': vars(options), 'results': {}}
+    if 'simulation' in options.suites:
+        results['results'].update(benchmark_simulation(options.sizes, options.con_types, options.trials, options.duration, options.repeat))
+    if 'io' in options.suites or 'analysis' in options.suites:
+        with tempfile.TemporaryDirectory() as path_to_dir:
+            observations = synthetic_observations(options.duration//50, options.io_trials, options.io_neurons)
+            io_results, path_to_binary = benchmark_io(observations, path_to_dir, options.repeat)
+            if 'io' in options.suites:
+                results['results'].update(io_results)
+            if 'analysis' in options.suites:
+                results['results'].update(benchmark_analysis(path_to_binary, options.io_neurons, options.backends, options.repeat))
+
+    with open(options.output, 'w') as file:
+        json.dump(results, file, indent=1)
+    print('results written in {}'.format(options.output))
+
+    if options.baseline is not None:
+        with open(options.baseline, 'r') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, options.tolerance, options.min_difference)
+        if regressions is None:
+            return 2
+        if len(regressions) > 0:
+            print('{} regression(s): {}'.format(len(regressions), ', '.join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import argparse
+import json
+import sys
+#Command line entry point, to run simulations, sweeps, analyses and conversions without a notebook, for example:
+#    python cli.py simulate --nb-neurons 20 --con-type simplex --trials 500 --output-dir observations/ --format binary
+#    python cli.py sweep parents_two_children --parent-con-type simplex --nb-parents 1 3 5 --trials 500
+#    python cli.py analyze observations/x_nb_neur_20_sw_10_tbs_50_stim_off --measure mutual_information:0:1 --measure PID:0:1:2
+#    python cli.py convert observations/x_nb_neur_20_sw_10_tbs_50_stim_off
+#    python cli.py analyze observations/x_nb_neur_20_sw_10_stim_off_spikes --time-bin-size 20 --measure entropy:0
+#Every subcommand only imports what it needs: the modules of the project are imported in the functions below rather than here, so that 'analyze' and 'convert' never import Brian2, and a simulation only imports matplotlib when a raster plot is requested (see simulation.plot_raster).
+
+
+def simulate(options):
+    import os
+    import gen_connections
+    path_to_dir = os.path.join(options.output_dir, '')
+    if (options.pre_syn is None) != (options.pos_syn is None) or (options.pre_syn is not None and len(options.pre_syn) != len(options.pos_syn)):
+        print('--pre-syn and --pos-syn have to be given together, with the same number of neurons.')
+        return 1
+    if options.workers is not None and options.workers > 1:
+        for unsupported, flag in [(options.format == 'spikes', '--format spikes'), (options.precision is not None, '--precision'), (options.report, '--report')]:
+            if unsupported:
+                print('{} cannot be used with sharded simulations (--workers > 1).'.format(flag))
+                return 1
+    if options.pre_syn is not None:
+        pre_syn, pos_syn = gen_connections.edges(options.pre_syn, options.pos_syn)
+    else:
+        connections = gen_connections.generate_connections(options.con_type, options.nb_neurons)
+        if connections is None:
+            return 1
+        pre_syn, pos_syn = connections
+    simulation_kwargs = {'nb_neurons': options.nb_neurons, 'synapse_weight': options.synapse_weight, 'time_bin_size': options.time_bin_size,
+                         'pre_syn': pre_syn, 'pos_syn': pos_syn, 'name': options.name if options.name is not None else options.con_type,
+                         'neurtype': options.neurtype, 'stim': options.stim, 'duration': options.duration, 'recording': options.recording,
+                         'con_type': options.con_type, 'backend': options.backend}
+
+    if options.workers is not None and options.workers > 1:
+        import sharded_simulation
+        sharded_simulation.simulate_sharded(simulation_kwargs, options.trials, path_to_dir, options.seed, options.workers, options.shard_size,
+                                            options.batched, options.format, compile_cache_dir=options.compile_cache)
+        ex = None
+    else:
+        import simulation
+        if options.compile_cache is not None:
+            simulation.set_compile_cache(options.compile_cache)
+        os.makedirs(path_to_dir, exist_ok=True)
+        ex = simulation.Simulation(seed=options.seed, instrument=options.report, **simulation_kwargs)
+        ex.simulate(options.trials, path_to_dir, batched=options.batched, file_format=options.format, precision=options.precision)
+        if options.report:
+            print(json.dumps(ex.instrumentation_report(), indent=1))
+
+    if options.raster:
+        import simulation
+        if ex is None:
+            ex = simulation.Simulation(seed=options.seed, **simulation_kwargs)
+        os.makedirs(path_to_dir + 'raster/', exist_ok=True)
+        ex.run_and_plot_example_raster(path_to_dir + 'raster/')
+    return 0
+
+def sweep(options):
+    import generate_experiments
+    kwargs = {'time_bin_sizes': options.time_bin_sizes, 'synapse_weights': options.synapse_weights, 'n_monte_carlo': options.trials,
+              'nb_workers': options.workers, 'path_to_log': options.log, 'backend': options.backend}
+    if options.experiment != 'three_neur_motifs':
+        kwargs['record_spikes'] = options.record_spikes
+    if options.experiment == 'parents_one_child':
+        manifest = generate_experiments.parents_one_child(options.parent_con_type, options.nb_parents, neuron_type=options.neurtype, **kwargs)
+    elif options.experiment == 'parents_two_children':
+        manifest = generate_experiments.parents_two_children(options.parent_con_type, options.nb_parents, options.children_con_types, neuron_type=options.neurtype, **kwargs)
+    else:
+        manifest = generate_experiments.three_neur_motifs(**kwargs)
+    if manifest is None:
+        return 1
+    statuses = [entry['status'] for entry in manifest.values()]
+    print(', '.join('{} {}'.format(statuses.count(status), status) for status in ['done', 'skipped', 'failed']))
+    return int('failed' in statuses)
+
+#A measure is given as NAME:VARS1[:VARS2[:VARS3]], where NAME is a measure of new_it_analyzer.Experiment_IT_analyzer.compute and each VARS is a comma separated list of indices of variables, 'children' or 'parents'. For example mutual_information:0:1, conditional_mutual_information:0:1:2,3 or PID:0:1:2.
+def parse_measure(text):
+    name, *variables = text.split(':')
+    return (name,) + tuple(vars1 if vars1 in ['children', 'parents'] else [int(var) for var in vars1.split(',') if var != ''] for vars1 in variables)
+
+def analyze(options):
+    import numpy as np
+    import new_it_analyzer
+    measures = [parse_measure(text) for text in options.measure]
+    labels = new_it_analyzer.measure_labels(measures)
+    results = {}
+    for path_to_file in options.files:
+        try:
+            values = new_it_analyzer.analyze_sweep_point(path_to_file, measures, options.nb_children, options.backend, options.time_bin_size)
+        except ValueError as error:
+            print(error)
+            return 1
+        if values is None:
+            return 1
+        results[path_to_file] = {'measures': labels, 'values': values.tolist(), 'mean': np.mean(values, axis=0).tolist()}
+    output = json.dumps(results, indent=1)
+    if options.output is None:
+        print(output)
+    else:
+        with open(options.output, 'w') as file:
+            file.write(output)
+    return 0
+
+def convert(options):
+    import observationsIO
+    for path_to_file in options.files:
+        if options.to == 'binary':
+            if observationsIO.is_binary_observations(path_to_file) and options.time_bin_size is None:
+                print('{} is already binary.'.format(path_to_file))
+                continue
+            if observationsIO.is_spike_file(path_to_file) or options.time_bin_size is not None:
+                observations = observationsIO.read_observation_array(path_to_file, time_bin_size=options.time_bin_size)
+                if observations is None:
+                    return 1
+                metadata = dict(observationsIO.read_metadata(path_to_file))
+                if options.time_bin_size is not None:
+                    metadata['time_bin_size'] = options.time_bin_size
+                observationsIO.write_observations_binary(observations, options.output if options.output is not None and len(options.files) == 1 else path_to_file + '.obs', metadata)
+                continue
+            observationsIO.convert_text_to_binary(path_to_file, options.output if len(options.files) == 1 else None)
+        else:
+            observations = observationsIO.read_observation_array(path_to_file, time_bin_size=options.time_bin_size)
+            if observations is None:
+                return 1
+            observationsIO.write_observations(observations.tolist(), options.output if options.output is not None and len(options.files) == 1 else path_to_file + '.txt')
+    return 0
+
+
+#Synapse weights are written in the file names (see Simulation.simulate), so integer weights are kept as ints, as in the sweeps of generate_experiments.
+def number(text):
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+def parser():
+    parser = argparse.ArgumentParser(description='Simulations of small networks of Izhikevich neurons and their information-theoretic analysis.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_simulate = subparsers.add_parser('simulate', help='simulate one network (see simulation.Simulation).')
+    parser_simulate.add_argument('--nb-neurons', type=int, required=True)
+    parser_simulate.add_argument('--con-type', default='disconnected', help='a connection type of gen_connections.generate_connections.')
+    parser_simulate.add_argument('--pre-syn', type=int, nargs='*', default=None, help='explicit connections, instead of --con-type.')
+    parser_simulate.add_argument('--pos-syn', type=int, nargs='*', default=None)
+    parser_simulate.add_argument('--synapse-weight', type=number, default=10)
+    parser_simulate.add_argument('--time-bin-size', type=int, default=50)
+    parser_simulate.add_argument('--name', default=None, help='prefix of the file of observations, the connection type by default.')
+    parser_simulate.add_argument('--neurtype', default='regular spiking', choices=['regular spiking', 'intrinsically bursting'])
+    parser_simulate.add_argument('--stim', default='off', choices=['on', 'off'])
+    parser_simulate.add_argument('--duration', type=int, default=1000)
+    parser_simulate.add_argument('--recording', default='network_operation', choices=['network_operation', 'spikemon'])
+    parser_simulate.add_argument('--backend', default='brian2', choices=['brian2', 'numpy'])
+    parser_simulate.add_argument('--seed', type=int, default=None)
+    parser_simulate.add_argument('--trials', type=int, default=500, help='number of Monte Carlo trials (the maximum number with --precision).')
+    parser_simulate.add_argument('--precision', type=float, default=None, help='stop as soon as the entropy of the first neuron is estimated to this precision (in bits).')
+    parser_simulate.add_argument('--batched', action='store_true', help='simulate all the trials at once (see Simulation.simulate).')
+    parser_simulate.add_argument('--output-dir', default='observations/')
+    parser_simulate.add_argument('--format', default='text', choices=['text', 'binary', 'spikes'], help='"spikes" keeps every spike, so that the observations can be binned with any time bin size when they are analyzed.')
+    parser_simulate.add_argument('--raster', action='store_true', help='also plot an example raster in <output-dir>/raster/.')
+    parser_simulate.add_argument('--compile-cache', default=None, help='directory of the compiled code (see simulation.set_compile_cache).')
+    parser_simulate.add_argument('--workers', type=int, default=None, help='split the trials into shards simulated by this number of processes (see sharded_simulation).')
+    parser_simulate.add_argument('--shard-size', type=int, default=50)
+    parser_simulate.add_argument('--report', action='store_true', help='print the timings of the phases of the simulation (not with --workers > 1).')
+    parser_simulate.set_defaults(function=simulate)
+
+    parser_sweep = subparsers.add_parser('sweep', help='run a sweep of generate_experiments.')
+    parser_sweep.add_argument('experiment', choices=['parents_one_child', 'parents_two_children', 'three_neur_motifs'])
+    parser_sweep.add_argument('--parent-con-type', default='disconnected')
+    parser_sweep.add_argument('--nb-parents', type=int, nargs='+', default=[1, 3, 5, 7, 9])
+    parser_sweep.add_argument('--children-con-types', nargs='+', default=['disconnected'])
+    parser_sweep.add_argument('--time-bin-sizes', type=int, nargs='+', default=[50])
+    parser_sweep.add_argument('--synapse-weights', type=number, nargs='+', default=[10])
+    parser_sweep.add_argument('--neurtype', default='regular spiking', choices=['regular spiking', 'intrinsically bursting'])
+    parser_sweep.add_argument('--backend', default='brian2', choices=['brian2', 'numpy'])
+    parser_sweep.add_argument('--record-spikes', action='store_true', help='simulate each network once and write its spikes, to be binned with each time bin size at analysis time (not for three_neur_motifs).')
+    parser_sweep.add_argument('--trials', type=int, default=500)
+    parser_sweep.add_argument('--workers', type=int, default=None, help='number of processes, the number of cores by default.')
+    parser_sweep.add_argument('--log', default=None, help='JSON-lines file in which the timings of every simulation are appended.')
+    parser_sweep.set_defaults(function=sweep)
+
+    parser_analyze = subparsers.add_parser('analyze', help='compute information-theoretic measures on files of observations.')
+    parser_analyze.add_argument('files', nargs='+')
+    parser_analyze.add_argument('--measure', action='append', required=True, help='NAME:VARS1[:VARS2[:VARS3]], e.g. mutual_information:0:1, conditional_mutual_information:0:1:2,3 or PID:0:1:2. Can be repeated.')
+    parser_analyze.add_argument('--nb-children', type=int, default=0, help='number of children, for measures on the variables "children" and "parents".')
+    parser_analyze.add_argument('--backend', default='numpy', choices=['numpy', 'dit'])
+    parser_analyze.add_argument('--time-bin-size', type=int, default=None, help='bin the observations with this time bin size (in ms), see new_it_analyzer.IT_analyzer.')
+    parser_analyze.add_argument('--output', default=None, help='JSON file of the results, printed by default.')
+    parser_analyze.set_defaults(function=analyze)
+
+    parser_convert = subparsers.add_parser('convert', help='convert files of observations between the text and binary formats, or bin spike files.')
+    parser_convert.add_argument('files', nargs='+')
+    parser_convert.add_argument('--to', default='binary', choices=['binary', 'text'])
+    parser_convert.add_argument('--output', default=None, help='output file when converting a single file. By default, text files are replaced by their binary version and binary files are written as <file>.txt and spike files (or binary files re-binned with --time-bin-size) as <file>.obs.')
+    parser_convert.add_argument('--time-bin-size', type=int, default=None, help='bin the observations with this time bin size (in ms), see observationsIO.read_observation_array.')
+    parser_convert.set_defaults(function=convert)
+    return parser
+
+def main(arguments=None):
+    options = parser().parse_args(arguments)
+    return options.function(options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,13 @@
 import numpy as np
+import scipy.sparse
 #These are functions to generate different connections for different networks. See Section 3.2.1 and Figure 4&5 in Jacob's write up for more details/intuition.
+#All of them return the pre_syn and pos_syn arrays (contiguous int32 arrays, built with vectorized index arithmetic) which can be given as they are to Simulation (and so to Synapses.connect). The i-th synapse goes from pre_syn[i] to pos_syn[i].
 
 
-#The following is the only method that should be called. With 'con_type' a string and 'nb_neurons' an int, returns the pre_syn and pos_syn lists. Note that the torus is special, as it requires nb_neurons to be a perfect square (to infer 'cycle1' and 'cycle2').
+#The following is the only method that should be called. With 'con_type' a string and 'nb_neurons' an int, returns the pre_syn and pos_syn arrays. Note that the torus is special, as it requires nb_neurons to be a perfect square (to infer 'cycle1' and 'cycle2').
 def generate_connections(con_type, nb_neurons):
     if con_type == 'disconnected':
-        return [], []
+        return edges([], [])
     elif con_type == 'full':
         return full(nb_neurons)
     elif con_type == 'full_no_loops':
@@ -14,49 +16,91 @@ def generate_connections(con_type, nb_neurons):
         return simplex(nb_neurons)
     elif con_type == 'torus':
         #in this case we construct a torus of nb_neurons^2 neurons (each cycle has length nb_neurons)
-        return torus(np.sqrt(nb_neurons), np.sqrt(nb_neurons)) 
+        cycle = int(round(np.sqrt(nb_neurons)))
+        if cycle*cycle != nb_neurons:
+            print('torus connections need a perfect square number of neurons.')
+            return None
+        return torus(cycle, cycle)
     elif con_type == 'simplex_torus':
         return simplex_torus(nb_neurons, nb_neurons)
     else:
         print('Connection type not identified.')
         return None
 
+def edges(pre_syn, pos_syn):
+    return np.ascontiguousarray(pre_syn, dtype=np.int32), np.ascontiguousarray(pos_syn, dtype=np.int32)
 
-#the following outputs the pre_syn and pos_syn lists to generate a fully connected network on 'nb_neurons' neurons.
+
+#the following outputs the pre_syn and pos_syn arrays to generate a fully connected network on 'nb_neurons' neurons.
 def full(nb_neurons):
-    pre_syn = [i  for j in range(nb_neurons) for i in range(nb_neurons)]
-    pos_syn = [j  for j in range(nb_neurons) for i in range(nb_neurons)]
-    return pre_syn, pos_syn
+    neurons = np.arange(nb_neurons, dtype=np.int32)
+    return edges(np.tile(neurons, nb_neurons), np.repeat(neurons, nb_neurons))
 
-#the following outputs the pre_syn and pos_syn lists to generate a fully connected network with no loops.
+#the following outputs the pre_syn and pos_syn arrays to generate a fully connected network with no loops.
 def full_no_loops(nb_neurons):
-    pre_syn = [j  for j in range(nb_neurons) for i in range(nb_neurons-1)]
-    pos_syn = [i  for j in range(nb_neurons) for i in list(range(j))+list(range(j+1, nb_neurons))]
-    return pre_syn, pos_syn
+    neurons = np.arange(nb_neurons, dtype=np.int32)
+    no_loops = ~np.eye(nb_neurons, dtype=bool)
+    return edges(np.repeat(neurons, nb_neurons-1), np.broadcast_to(neurons, (nb_neurons, nb_neurons))[no_loops])
 
-#the following outputs the pre_syn and pos_syn lists to generate a fully simplex/clique network on 'nb_neurons' neurons.
+#the following outputs the pre_syn and pos_syn arrays to generate a fully simplex/clique network on 'nb_neurons' neurons: neuron i projects to all neurons j > i (from the sink dim down to i+1).
 def simplex(nb_neurons):#simplex with np_parents vertices
-    dim=nb_neurons-1
-    pre_syn=[i for i in range(dim) for j in range(dim-i)]
-    post_syn=[dim-j for i in range(dim) for j in range(dim-i)]
-    return pre_syn, post_syn
+    dim = max(nb_neurons-1, 0)
+    nb_targets = dim - np.arange(dim) #neuron i has dim-i targets
+    first_synapse = np.cumsum(nb_targets) - nb_targets
+    target_rank = np.arange(nb_targets.sum()) - np.repeat(first_synapse, nb_targets)
+    return edges(np.repeat(np.arange(dim), nb_targets), dim - target_rank)
 
-#the following outputs the pre_syn and pos_syn lists to generate a fully torus network on 'cylce1'*'cycle2' neurons, where each param corresponds to the length of each cycle, when one thinks of the torus as a cartesian product of two cycles.
-def torus(cycle1, cycle2): 
-    pre_syn=[y*cycle1+x for y in range(cycle2) for x in range(cycle1)]+[y*cycle1+x for y in range(cycle2) for x in range(cycle1)]
-    post_syn=[y*cycle1+((x+1)%cycle1) for y in range(cycle2) for x in range(cycle1)]+[x+cycle1*((y+1)%cycle2) for y in range(cycle2) for x in range(cycle1)]
-    return pre_syn, post_syn #graph products?
+#the following outputs the pre_syn and pos_syn arrays to generate a fully torus network on 'cylce1'*'cycle2' neurons, where each param corresponds to the length of each cycle, when one thinks of the torus as a cartesian product of two cycles.
+def torus(cycle1, cycle2):
+    cycle1, cycle2 = int(cycle1), int(cycle2)
+    neurons = np.arange(cycle1*cycle2) #neuron y*cycle1+x is at position (x, y)
+    x, y = neurons%cycle1, neurons//cycle1
+    pre_syn = np.concatenate([neurons, neurons])
+    post_syn = np.concatenate([y*cycle1+(x+1)%cycle1, x+cycle1*((y+1)%cycle2)])
+    return edges(pre_syn, post_syn) #graph products?
 
 #Similar to previous, but with diagonals added
 def simplex_torus(cycle1, cycle2):
+    cycle1, cycle2 = int(cycle1), int(cycle2)
     pre_syn, post_syn = torus(cycle1, cycle2)
-    pre_syn+=[(y*cycle1+x) for y in range(cycle2) for x in range(cycle1)]
-    post_syn+=[(((y+1)%cycle2)*cycle1+(x+1)%cycle1) for y in range(cycle2) for x in range(cycle1)]
-    return pre_syn, post_syn
+    neurons = np.arange(cycle1*cycle2)
+    x, y = neurons%cycle1, neurons//cycle1
+    return concatenate_edges((pre_syn, post_syn), (neurons, ((y+1)%cycle2)*cycle1+(x+1)%cycle1))
 
 
 def parents(nb_p1, nb_p12, nb_p2): # this gives the network connections with two children neurons, nb_p1 parents above first neuron, nb_p2 above second and nb_p12 above both simultaniously
-    pre_syn=[x+2 for x in range(nb_p1)]+[x+2 for x in range(nb_p1, nb_p1+nb_p12)]+[x+2 for x in range(nb_p1, nb_p1+nb_p12)]+[x+2 for x in range(nb_p1+nb_p12, nb_p1+nb_p12+nb_p2)] 
-    post_syn=[0 for x in range(nb_p1)]+[0 for x in range(nb_p1, nb_p1+nb_p12)]+[1 for x in range(nb_p1, nb_p1+nb_p12)]+[1 for x in range(nb_p1+nb_p12, nb_p1+nb_p12+nb_p2)]
-    return pre_syn, post_syn
+    p1 = np.arange(2, nb_p1+2)
+    p12 = np.arange(nb_p1+2, nb_p1+nb_p12+2)
+    p2 = np.arange(nb_p1+nb_p12+2, nb_p1+nb_p12+nb_p2+2)
+    return concatenate_edges(star(np.concatenate([p1, p12]), [0]), star(np.concatenate([p12, p2]), [1]))
+
+
+#The following compose connections.
+
+#Shifts all the neuron indices by 'offset', e.g. to place a network of parents after the children.
+def relabel(pre_syn, pos_syn, offset):
+    return edges(np.asarray(pre_syn) + offset, np.asarray(pos_syn) + offset)
+
+def concatenate_edges(*connections):
+    if len(connections) == 0:
+        return edges([], [])
+    return edges(np.concatenate([pre_syn for pre_syn, pos_syn in connections]), np.concatenate([pos_syn for pre_syn, pos_syn in connections]))
+
+#Disjoint union of networks, given as a list of (pre_syn, pos_syn, nb_neurons): the neurons of each network are placed after those of the previous ones. Returns the pre_syn and pos_syn arrays, and the total number of neurons.
+def disjoint_union(networks):
+    connections = []
+    offset = 0
+    for pre_syn, pos_syn, nb_neurons in networks:
+        connections.append(relabel(pre_syn, pos_syn, offset))
+        offset += nb_neurons
+    return concatenate_edges(*connections) + (offset,)
+
+#Connects every neuron in 'sources' to every neuron in 'targets' (e.g. all parents to a child), target after target.
+def star(sources, targets):
+    sources, targets = np.asarray(sources), np.asarray(targets)
+    return edges(np.tile(sources, len(targets)), np.repeat(targets, len(sources)))
 
+#Sparse adjacency matrix (scipy CSR) of the connections: entry (i, j) is the number of synapses from i to j.
+def adjacency(pre_syn, pos_syn, nb_neurons):
+    pre_syn, pos_syn = edges(pre_syn, pos_syn)
+    return scipy.sparse.csr_matrix((np.ones(len(pre_syn), dtype=np.int32), (pre_syn, pos_syn)), shape=(nb_neurons, nb_neurons))
@@ -1,7 +1,7 @@
 import gen_connections
-import simulation
 import numpy as np
 import new_it_analyzer
+import sweep_runner
 
 #These generate Jacob's experiments, they summarize what is done in the ParentConnComparer and CommonParents notebooks. 
 
@@ -20,98 +20,87 @@ import new_it_analyzer
 """
 
 #See notebook for examples.
-def parents_one_child(parent_con_type='disconnected', nb_parents_list=np.arange(1,40, 2), time_bin_sizes=[50], synapse_weights=[10], neuron_type='regular_spiking',n_monte_carlo=500):
-    
-    for tbs in time_bin_sizes:
+#All the experiments of a sweep are run by sweep_runner.run_sweep on 'nb_workers' processes (the number of cores by default). The directories are created if needed, experiments whose observations are already complete are skipped, and the status and duration of each experiment is kept in a 'sweep_manifest.json' file, so an interrupted sweep resumes where it stopped.
+#If 'path_to_log' is given, the simulations are instrumented and the report of each one (time spent in code generation, in the simulation loop, writing the observations, ..., see Simulation.instrumentation_report) is appended to this JSON-lines file.
+#'backend' is the backend of the simulations ('brian2' or 'numpy', see simulation.Simulation).
+#If 'record_spikes' is True, each network is simulated once whatever the time bin sizes: its spikes are written in a spike file (see Simulation.simulate(..., file_format='spikes')), which is binned with each time bin size at analysis time (see new_it_analyzer.Experiment_IT_analyzer(..., spikes=True)).
+def parents_one_child(parent_con_type='disconnected', nb_parents_list=np.arange(1,40, 2), time_bin_sizes=[50], synapse_weights=[10], neuron_type='regular spiking',n_monte_carlo=500, nb_workers=None, path_to_log=None, backend='brian2', record_spikes=False):
+    PATH_TO_DIR = 'observations/parents_one_child/'+parent_con_type+'/'
+    jobs = []
+    simulate_kwargs = {'file_format': 'spikes'} if record_spikes else None
+    for tbs in (time_bin_sizes[:1] if record_spikes else time_bin_sizes):
         for synapse_weight in synapse_weights:
             for nb_parents in nb_parents_list:
-                PATH_TO_DIR = 'observations/parents_one_child/'+parent_con_type+'/'#make sure that you have this path, and that in the folder there is a raster folder!
                 nb_neurons=nb_parents+1
             
-                #for parent child conn
-                pre_syn=[i for i in range(1, nb_parents+1)] 
-                pos_syn=[0 for x in range(1, nb_parents+1)]
-            
-                #inter-parent-connection:
+                #for parent child conn, then inter-parent-connection:
                 parent_pre_syn, parent_pos_syn = gen_connections.generate_connections(parent_con_type, nb_parents)
-                pre_syn+=[x+1 for x in parent_pre_syn]
-                pos_syn+=[x+1 for x in parent_pos_syn]
+                pre_syn, pos_syn = gen_connections.concatenate_edges(
+                    gen_connections.star(np.arange(1, nb_parents+1), [0]),
+                    gen_connections.relabel(parent_pre_syn, parent_pos_syn, 1))
 
-                ex=simulation.Simulation(nb_neurons, synapse_weight, tbs, pre_syn, pos_syn, 'parents_{}_child_1'.format(nb_parents), stim='off', neurtype = neuron_type)
-                ex.simulate(n_monte_carlo, PATH_TO_DIR)
-                ex.run_and_plot_example_raster(PATH_TO_DIR+'raster/') #make sure you have a raster folder in the directiory
-    return None
+                jobs.append(sweep_runner.make_job(PATH_TO_DIR, n_monte_carlo, nb_neurons=nb_neurons, synapse_weight=synapse_weight, time_bin_size=tbs, simulate_kwargs=simulate_kwargs, pre_syn=pre_syn, pos_syn=pos_syn, name='parents_{}_child_1'.format(nb_parents), stim='off', neurtype=neuron_type, con_type=parent_con_type, backend=backend))
+    return sweep_runner.run_sweep(jobs, PATH_TO_DIR+'sweep_manifest.json', nb_workers, path_to_log=path_to_log)
 
 """Similar to above, but this corresponds to Section 4.2 and 4.3. Now we have two children, and therefore a new parameter: 
     - children_con_type_list: list of string,
         Each string is considered individually as the inter-children connection type"""
 
-def parents_two_children(parent_con_type='disconnected', nb_parents_list=np.arange(1,20, 2), children_con_type_list=['disconnected'], time_bin_sizes=[50], synapse_weights=[10], neuron_type='regular_spiking', n_monte_carlo=500):
+def parents_two_children(parent_con_type='disconnected', nb_parents_list=np.arange(1,20, 2), children_con_type_list=['disconnected'], time_bin_sizes=[50], synapse_weights=[10], neuron_type='regular spiking', n_monte_carlo=500, nb_workers=None, path_to_log=None, backend='brian2', record_spikes=False):
     if parent_con_type == 'torus':
         print('this does no work for torus connections...')
         return None
-    for tbs in time_bin_sizes:
+    jobs = []
+    simulate_kwargs = {'file_format': 'spikes'} if record_spikes else None
+    for tbs in (time_bin_sizes[:1] if record_spikes else time_bin_sizes):
         for synapse_weight in synapse_weights:
             for nb_parents in nb_parents_list:
                 for children_con_type in children_con_type_list:
-                    PATH_TO_DIR = 'observations/parents_two_children/' + parent_con_type+'_parents/' + children_con_type + '_children/' #Make sure that this path exists, and that in the folder there is a raster folder!
+                    PATH_TO_DIR = 'observations/parents_two_children/' + parent_con_type+'_parents/' + children_con_type + '_children/'
                     nb_neurons=nb_parents+2
 
-                    #for parent child conn
-                    pre_syn=[i for i in range(2, nb_parents+2)]+[i for i in range(2, nb_parents+2)] 
-                    pos_syn=[0 for x in range(2, nb_parents+2)]+[1 for x in range(2, nb_parents+2)] 
-
-                    #inter-parent-connection:
+                    #for parent child conn, then inter-parent-connection:
                     parent_pre_syn, parent_pos_syn = gen_connections.generate_connections(parent_con_type, nb_parents)
-                    pre_syn+=[x+2 for x in parent_pre_syn]
-                    pos_syn+=[x+2 for x in parent_pos_syn]
+                    pre_syn, pos_syn = gen_connections.concatenate_edges(
+                        gen_connections.star(np.arange(2, nb_parents+2), [0, 1]),
+                        gen_connections.relabel(parent_pre_syn, parent_pos_syn, 2))
 
-                    ex=simulation.Simulation(nb_neurons, synapse_weight, tbs, pre_syn, pos_syn, 'parents_{}_child_2'.format(nb_parents), stim='off', neurtype = neuron_type)
-                    ex.simulate(n_monte_carlo, PATH_TO_DIR)
-                    ex.run_and_plot_example_raster(PATH_TO_DIR+'raster/') #make sure you have a raster folder in the directiory
-    return None
+                    jobs.append(sweep_runner.make_job(PATH_TO_DIR, n_monte_carlo, nb_neurons=nb_neurons, synapse_weight=synapse_weight, time_bin_size=tbs, simulate_kwargs=simulate_kwargs, pre_syn=pre_syn, pos_syn=pos_syn, name='parents_{}_child_2'.format(nb_parents), stim='off', neurtype=neuron_type, con_type=parent_con_type+'_parents_'+children_con_type+'_children', backend=backend))
+    return sweep_runner.run_sweep(jobs, 'observations/parents_two_children/' + parent_con_type+'_parents/sweep_manifest.json', nb_workers, path_to_log=path_to_log)
         
 
     "This corresponds to Section 4.4 is Jacob's write-up"
-def three_neur_motifs(time_bin_sizes=[50], synapse_weights=[10], neuron_params=['regular_spiking'],n_monte_carlo=500):
+def three_neur_motifs(time_bin_sizes=[50], synapse_weights=[10], neuron_params=['regular_spiking'],n_monte_carlo=500, nb_workers=None, path_to_log=None, backend='brian2'):
     
     possible_con_3_neur=[([0],[1]), ([0, 1], [1, 0]), ([0, 1],[1, 2]), ([0, 2], [1, 1]), ([1, 1], [0, 2]), ([0, 1, 1],[1, 0, 2]), ([0, 1, 2], [1, 0, 1]), ([0, 0, 1], [1,2, 2]), ([0, 1, 2], [1, 2, 0]), ([0, 1, 1, 2], [1, 0, 2, 1]), ([0, 1, 1, 2], [1, 0, 2, 0]), ([0, 0, 1, 1], [1, 2, 0, 2]), ([0, 1, 2,2], [1, 0, 0, 1]), ([0, 1, 1, 2, 2], [1, 0, 2, 0, 1]), ([0,0,1,1,2,2], [1,2,0,2,0,1])]
 
+    PATH_TO_DIR = f'observations/three_neuron_motifs/'
+    jobs = []
     for tbs in time_bin_sizes:
-        for synpase_weight in synapse_weights:
+        for synapse_weight in synapse_weights:
             for graph_type in range(len(possible_con_3_neur)):
-                PATH_TO_DIR = f'observations/three_neuron_motifs/'
-                pre_syn=[]
-                post_syn=[]
                 pre_syn=possible_con_3_neur[graph_type][0]
                 post_syn=possible_con_3_neur[graph_type][1]
-                ex=simulation.Simulation(3, synapse_weight, tbs, pre_syn, post_syn, 'graph_type_{}'.format(graph_type))
-                ex.run_and_plot_example_raster(PATH_TO_DIR+'raster/')
-                ex.simulate(n_monte_carlo, PATH_TO_DIR)
-    return None
+                jobs.append(sweep_runner.make_job(PATH_TO_DIR, n_monte_carlo, nb_neurons=3, synapse_weight=synapse_weight, time_bin_size=tbs, pre_syn=pre_syn, pos_syn=post_syn, name='graph_type_{}'.format(graph_type), con_type='motif_{}'.format(graph_type), backend=backend))
+    return sweep_runner.run_sweep(jobs, PATH_TO_DIR+'sweep_manifest.json', nb_workers, path_to_log=path_to_log)
 
 
 
 #These were used to plot the Figures in the above sections:
 
-def generate_children_mut_inf(connection_type, xaxis, sw, tbs, children_connection_type='disconnected'):
-    PATH_TO_DIR = 'observations/parent_two_children/'+connection_type+'_parents/' + children_connection_type + '_children/'
-    analyzs=[new_it_analyzer.IT_analyzer(PATH_TO_DIR+'parents_{}_child_2_nb_neur_{}_sw_{}_tbs_{}_stim_off'.format(i, i+2, sw, tbs)) for i in xaxis]
-    children_mutual_inf=[np.mean([dit.shannon.mutual_information(d, [0], [1], rv_mode='indices') for d in analyz.dists]) for analyz in analyzs]
+#They analyze the sweep points (one per number of parents in 'xaxis') concurrently on 'nb_workers' processes, see new_it_analyzer.Experiment_IT_analyzer, and return the mean of the measure over the time bins at each point. With 'spikes', the observations are binned from the spike files of sweeps run with record_spikes=True.
+def generate_children_mut_inf(connection_type, xaxis, sw, tbs, children_connection_type='disconnected', backend='numpy', nb_workers=None, spikes=False):
+    analyzer = new_it_analyzer.Experiment_IT_analyzer(connection_type, xaxis, tbs, sw, children_connection_type=children_connection_type, backend=backend, nb_workers=nb_workers, spikes=spikes)
+    children_mutual_inf = list(analyzer.compute([('mutual_information', [0], [1])])['mean'][:, 0])
     return children_mutual_inf
 
 #same but conditioned on parents
-def generate_children_cond_mut_inf(connection_type, xaxis, sw, tbs, children_connection_type='disconnected'):
-    PATH_TO_DIR = 'observations/parent_two_children/'+connection_type+'_parents/' + children_connection_type + '_children/'
-    analyzs=[new_it_analyzer.IT_analyzer(PATH_TO_DIR+'parents_{}_child_2_nb_neur_{}_sw_{}_tbs_{}_stim_off'.format(i, i+2, sw, tbs)) for i in xaxis]
-    children_mutual_inf=[np.mean([dit.shannon.conditional_entropy(d, [0], range(2,analyz.nb_neurons), rv_mode='indices')-dit.shannon.conditional_entropy(d, [0], range(1, analyz.nb_neurons), rv_mode='indices') for d in analyz.dists]) for analyz in analyzs]
+def generate_children_cond_mut_inf(connection_type, xaxis, sw, tbs, children_connection_type='disconnected', backend='numpy', nb_workers=None, spikes=False):
+    analyzer = new_it_analyzer.Experiment_IT_analyzer(connection_type, xaxis, tbs, sw, children_connection_type=children_connection_type, backend=backend, nb_workers=nb_workers, spikes=spikes)
+    children_mutual_inf = list(analyzer.compute([('conditional_mutual_information', [0], [1], 'parents')])['mean'][:, 0])
     return children_mutual_inf
 
-def generate_child_entropy_siblings(connection_type, xaxis, sw, tbs, children_connection_type=None):
-    PATH_TO_DIR = 'observations/parent_two_children/'+connection_type+'_parents/' + children_connection_type + '_children/'
-    analyzs=[new_it_analyzer.IT_analyzer(PATH_TO_DIR+'parents_{}_child_2_nb_neur_{}_sw_{}_tbs_{}_stim_off'.format(i, i+2, sw, tbs)) for i in xaxis]
-    child_entropy=[np.mean([dit.shannon.entropy(d, [0], rv_mode='indices') for d in analyz.dists]) for analyz in analyzs]
+def generate_child_entropy_siblings(connection_type, xaxis, sw, tbs, children_connection_type='disconnected', backend='numpy', nb_workers=None, spikes=False):
+    analyzer = new_it_analyzer.Experiment_IT_analyzer(connection_type, xaxis, tbs, sw, children_connection_type=children_connection_type, backend=backend, nb_workers=nb_workers, spikes=spikes)
+    child_entropy = list(analyzer.compute([('entropy', [0])])['mean'][:, 0])
     return child_entropy
-
-
-#A nice way to organize this would be to do an experiment_analysis class, combining Skander'S it_analyzer class to this.
\ No newline at end of file
@@ -0,0 +1,94 @@
+import json
+import time
+#Opt-in instrumentation of the phases of a simulation or of an analysis (see Simulation(..., instrument=True) and IT_analyzer(..., instrument=True)): it records the wall time and the number of calls of every phase, together with counters (e.g. the number of trials or of bytes written) and samples (e.g. the number of outcomes of the distribution of every bin).
+#When the instrumentation is disabled, the objects hold DISABLED instead, whose methods do nothing, so that the instrumented code only pays for a method call. Anything that is costly to measure is guarded by 'if instrumentation.enabled'.
+
+
+class Phase:
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        self.instrumentation.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Instrumentation:
+    enabled = True
+
+    def __init__(self):
+        self.phases = {} #name -> [seconds, calls]
+        self.counters = {}
+        self.samples = {}
+
+    #To be used as 'with instrumentation.phase(name): ...'
+    def phase(self, name):
+        return Phase(self, name)
+
+    def add_time(self, name, seconds, calls=1):
+        totals = self.phases.setdefault(name, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def sample(self, name, value):
+        self.samples.setdefault(name, []).append(value)
+
+    def reset(self):
+        self.phases, self.counters, self.samples = {}, {}, {}
+
+    #The structured report: {'phases': {name: {'seconds', 'calls'}}, 'counters': {name: total}, 'samples': {name: {'count', 'total', 'min', 'max', 'mean', 'values'}}}.
+    def report(self):
+        return {'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.phases.items()},
+                'counters': dict(self.counters),
+                'samples': {name: {'count': len(values), 'total': sum(values), 'min': min(values), 'max': max(values), 'mean': sum(values)/len(values), 'values': list(values)}
+                            for name, values in self.samples.items()}}
+
+
+class NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+class DisabledInstrumentation:
+    enabled = False
+    null_phase = NullPhase()
+
+    def phase(self, name):
+        return self.null_phase
+
+    def add_time(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def sample(self, name, value):
+        pass
+
+    def reset(self):
+        pass
+
+    def report(self):
+        return None
+
+DISABLED = DisabledInstrumentation()
+
+
+def get_instrumentation(instrument):
+    return Instrumentation() if instrument else DISABLED
+
+#Appends 'record' (a dict, e.g. {'job': ..., 'report': ...}) as one line of the JSON-lines file 'path_to_log'.
+def append_to_log(path_to_log, record):
+    with open(path_to_log, 'a') as file:
+        file.write(json.dumps(record, default=lambda value: value.item()) + '\n')
@@ -1,37 +1,120 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
-import dit #this is the library used for the information theory: https://dit.readthedocs.io/en/latest/generalinfo.html
-from observationsIO import read_observations
+from collections import OrderedDict
+import plugin_entropy
+import plugin_pid
+import plugin_pairwise
+import instrumentation
+from observationsIO import read_observation_array
 
+#A bounded cache of entropies, keyed by (bin_index, frozenset of variables). When it is full, the least recently used entropy is dropped.
+class EntropyCache:
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self.entropies = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def __contains__(self, key):
+        return key in self.entropies
+    
+    def get(self, key):
+        if key not in self.entropies:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entropies.move_to_end(key)
+        return self.entropies[key]
+    
+    def put(self, key, entropy):
+        self.entropies[key] = entropy
+        self.entropies.move_to_end(key)
+        while len(self.entropies) > self.max_size:
+            self.entropies.popitem(last=False)
+    
+    
+#The list of the distributions of each time bin, where the distribution of a bin is only built (by 'build_distribution', from the bin index) the first time it is accessed.
+class LazyDistributions:
+    def __init__(self, build_distribution, nb_time_bins):
+        self.build_distribution = build_distribution
+        self.dists = [None]*nb_time_bins
+        self.bin_indices = {} #to find the bin index (and so the cache entries) of a distribution that was already built.
+    
+    def __len__(self):
+        return len(self.dists)
+    
+    def __getitem__(self, bin_index):
+        if isinstance(bin_index, slice):
+            return [self[index] for index in range(*bin_index.indices(len(self)))]
+        if self.dists[bin_index] is None:
+            d = self.build_distribution(bin_index % len(self))
+            self.dists[bin_index] = d
+            self.bin_indices[id(d)] = bin_index % len(self)
+        return self.dists[bin_index]
+    
+    def __iter__(self):
+        return (self[bin_index] for bin_index in range(len(self)))
+    
+    
 class IT_analyzer:
-    def __init__(self, path_to_file, stim='off'):
-        self.bins_of_observations = read_observations(path_to_file)#shape (number of bins) x (number of experiments) x (number of random variables per bin). This is equal to (nb_bins, n_monte, stim+nbneur) with stim=0 if 'off', 1 o.w. . 
+    #'backend' is either 'dit' or 'numpy'. With 'dit', self.dists are dit distributions. With 'numpy', self.dists are the arrays of observations of each bin (of shape (n_monte, stim+nbneur)) and the measures are computed by the vectorized plug-in estimators of plugin_entropy, which give the same values as dit.
+    #Every entropy computed on a member of self.dists is stored in self.entropy_cache (of size 'cache_size'), so that no marginal entropy is computed twice.
+    #If 'instrument' is True, the time spent reading the observations, building the distributions and computing entropies is recorded, together with the number of outcomes of the distribution of each bin (see instrumentation_report).
+    #The distribution of a bin is only built when it is first used. If 'variables' (a list of indices of the variables of the file, the stimulus being variable 0 when stim == 'on') is given, the observations are projected onto these variables as soon as they are read, and the variables are then referred to by their position in 'variables'. For example, with variables=[0, 1, 2] only the children of the two children experiments are kept, which is much lighter for files with many parents.
+    #If 'time_bin_size' (in ms) is given, the observations are binned with this time bin size when they are read: a spike file (see Simulation.simulate(..., file_format='spikes')) can be analyzed with any time bin size that divides the duration, and a binary file with any multiple of its own time bin size (see observationsIO.read_observation_array). Other time bin sizes raise a ValueError.
+    def __init__(self, path_to_file, stim='off', backend='dit', cache_size=4096, variables=None, instrument=False, time_bin_size=None):
+        self.backend = backend
+        self.entropy_cache = EntropyCache(cache_size)
+        self.instrumentation = instrumentation.get_instrumentation(instrument)
+        with self.instrumentation.phase('read_observations'):
+            self.bins_of_observations = read_observation_array(path_to_file, time_bin_size=time_bin_size)#shape (number of bins) x (number of experiments) x (number of random variables per bin). This is equal to (nb_bins, n_monte, stim+nbneur) with stim=0 if 'off', 1 o.w. . 
+        if self.bins_of_observations is None: #read_observation_array printed why
+            raise ValueError('The observations of {} cannot be read with time bin size {}.'.format(path_to_file, time_bin_size))
         self.nb_time_bins = len(self.bins_of_observations)
         self.stim = stim
         if stim == 'off' :
-            self.nb_neurons = len(self.bins_of_observations[0][0])
+            self.nb_neurons = self.bins_of_observations.shape[2]
         else:
-            self.nb_neurons = len(self.bins_of_observations[0][0])-1
+            self.nb_neurons = self.bins_of_observations.shape[2]-1
             
-        self.dists = self.generate_distributions() 
+        self.variables = list(range(self.bins_of_observations.shape[2]))
+        self.project(variables if variables is not None else self.variables)
+    
+    #Projects the observations onto 'variables' (positions in the current variables), which are from then on referred to by their position in 'variables'. The distributions are built again when they are used, and the entropies of the previous variables are dropped from the cache.
+    def project(self, variables):
+        if list(variables) != list(range(len(self.variables))):
+            self.variables = [self.variables[var] for var in variables]
+            self.bins_of_observations = self.bins_of_observations[:, :, list(variables)]
+            self.entropy_cache = EntropyCache(self.entropy_cache.max_size)
+        if self.backend == 'numpy':
+            self.dists = LazyDistributions(self.observations_of_bin, self.nb_time_bins)
+        else:
+            self.dists = LazyDistributions(self.generate_distribution, self.nb_time_bins)
         
 
     def generate_distributions(self):
         #Outputs a list of nb_time_bins=DUR/tbs distributions which are dictionaries of probabilities with keys being the vectors encoding firing info. Note that tbs has to divide DUR.
-        dists = []
-        for bin_index, observations in enumerate(self.bins_of_observations):
-            if self.stim == 'on': #if I is nontrivial
-                dists.append(
-                    self.generate_prob_distribution(
-                        observations, #observations has shape (DUR/tbs, 1+nbneur)
-                        var_names= ['I'] + ['Neuron_{}_bin_{}_Spk_count'.format(
-                            neuron_index, bin_index) for neuron_index in range(self.nb_neurons)]))
+        return [self.generate_distribution(bin_index) for bin_index in range(self.nb_time_bins)]
+    
+    def generate_distribution(self, bin_index):
+        with self.instrumentation.phase('build_distribution'):
+            d = self.build_distribution(bin_index)
+        if self.instrumentation.enabled:
+            self.instrumentation.sample('outcomes_per_bin', len(d.outcomes))
+        return d
+    
+    def build_distribution(self, bin_index):
+        #The distribution of the bin 'bin_index', restricted to self.variables.
+        observations = [tuple(obs) for obs in self.bins_of_observations[bin_index].astype(float).tolist()] #observations has shape (n_monte, len(variables))
+        var_names = []
+        for var in self.variables:
+            if self.stim == 'on' and var == 0: #if I is nontrivial
+                var_names.append('I')
             else:
-                dists.append(
-                    self.generate_prob_distribution(
-                        observations, #observations has shape (DUR/tbs, nbneur)
-                        var_names= ['Neuron_{}_bin_{}_Spk_count'.format(
-                            neuron_index, bin_index) for neuron_index in range(self.nb_neurons)]))
-        return dists
+                var_names.append('Neuron_{}_bin_{}_Spk_count'.format(var - (self.stim == 'on'), bin_index))
+        return self.generate_prob_distribution(observations, var_names=var_names)
     
     def generate_prob_distribution(self, observations,  var_names=None):
         #Inputs a list of shape (n_monte, stim+nb_neur) and outputs a ditribution by averaging on the n_monte axis 
@@ -43,6 +126,7 @@ class IT_analyzer:
         for obs in pmf:
             pmf[obs] /= len(observations) #normalize by nb of vectors in this time bin
 
+        import dit #this is the library used for the information theory: https://dit.readthedocs.io/en/latest/generalinfo.html. It is only imported by the 'dit' backend, as importing it is slow.
         d = dit.Distribution(pmf)
 
         if var_names is not None:
@@ -51,35 +135,136 @@ class IT_analyzer:
         return d
     
 
+    #The distribution of a bin with the 'numpy' backend: the array of its observations.
+    def observations_of_bin(self, bin_index):
+        observations = self.bins_of_observations[bin_index]
+        if self.instrumentation.enabled:
+            self.instrumentation.sample('outcomes_per_bin', plugin_entropy.compress_codes(plugin_entropy.encode_rows(observations, list(range(observations.shape[1])))[0])[1])
+        return observations
+    
+    #The report of the instrumentation (see instrumentation.Instrumentation.report), with the hits and misses of the entropy cache. It is None if the analyzer was not created with instrument=True.
+    def instrumentation_report(self):
+        report = self.instrumentation.report()
+        if report is not None:
+            report['counters']['entropy_cache_hits'] = self.entropy_cache.hits
+            report['counters']['entropy_cache_misses'] = self.entropy_cache.misses
+        return report
+    
+    
     #The following is used in Skander's Bachelor thesis.
     
     def compute_stimulus_encodings(self):
         return [[self.NMI(d, [0], [neuron_idx]) for d in self.dists] for neuron_idx in range(1, self.nb_neurons+1)]
     
     
+    #The following measures take 'd' to be a member of self.dists (a dit distribution or an array of observations, depending on the backend), and variables given by their indices.
+    
+    def entropy(self, d, vars1):
+        if id(d) in self.dists.bin_indices:
+            key = (self.dists.bin_indices[id(d)], frozenset(vars1))
+            H = self.entropy_cache.get(key)
+            if H is None:
+                H = self.compute_entropy(d, vars1)
+                self.entropy_cache.put(key, H)
+            return H
+        return self.compute_entropy(d, vars1)
+    
+    def compute_entropy(self, d, vars1):
+        if len(vars1) == 0:
+            return 0.0
+        self.instrumentation.count('entropies_computed')
+        with self.instrumentation.phase('compute_entropy'):
+            if isinstance(d, np.ndarray):
+                return plugin_entropy.entropy(d, vars1)
+            import dit
+            return dit.shannon.entropy(d, vars1, rv_mode='indices')
+    
+    def mutual_information(self, d, vars1, vars2):
+        return self.entropy(d, vars1) + self.entropy(d, vars2) - self.entropy(d, list(vars1) + list(vars2))
+    
+    def conditional_entropy(self, d, vars1, cond):
+        return self.entropy(d, list(vars1) + list(cond)) - self.entropy(d, cond)
+    
+    def conditional_mutual_information(self, d, vars1, vars2, cond):
+        return self.conditional_entropy(d, vars1, cond) - self.conditional_entropy(d, vars1, list(vars2) + list(cond))
+    
     def NMI(self, d, vars1, vars2):#normalized mutual information
-        MI = dit.shannon.mutual_information(d, vars1, vars2, rv_mode='indices')
-        Hvars1 = dit.shannon.entropy(d, vars1, rv_mode='indices')
-        Hvars2 = dit.shannon.entropy(d, vars2, rv_mode='indices')
+        MI = self.mutual_information(d, vars1, vars2)
+        Hvars1 = self.entropy(d, vars1)
+        Hvars2 = self.entropy(d, vars2)
         return 2*MI/(Hvars1 + Hvars2)
 
     def NCMI(self, d, vars1, vars2, cond):#normalized conditional mutual information
-        CMI = dit.shannon.conditional_entropy(d, vars1, cond, rv_mode='indices') - dit.shannon.conditional_entropy(d, vars1, vars2+cond, rv_mode='indices')
-        Hvars1 = dit.shannon.entropy(d, vars1, rv_mode='indices')
-        Hvars2 = dit.shannon.entropy(d, vars2, rv_mode='indices')
+        CMI = self.conditional_mutual_information(d, vars1, vars2, cond)
+        Hvars1 = self.entropy(d, vars1)
+        Hvars2 = self.entropy(d, vars2)
         return 2*CMI/(Hvars1 + Hvars2)
     
+    #The following compute the same measures for all time bins at once, and return arrays of shape (nb_time_bins,). With the 'numpy' backend, each entropy is computed for all bins in a single batched call.
+    
+    #The entropies that are not all in the cache are computed and returned directly (each key that was not in the cache counting as a miss), the others are read from the cache.
+    def entropies(self, vars1):
+        keys = [(bin_index, frozenset(vars1)) for bin_index in range(self.nb_time_bins)]
+        nb_missing = sum(key not in self.entropy_cache for key in keys)
+        if self.backend == 'numpy' and nb_missing > 0:
+            self.entropy_cache.misses += nb_missing
+            with self.instrumentation.phase('compute_entropy'):
+                Hs = np.asarray(plugin_entropy.entropy(self.bins_of_observations, vars1), dtype=float)
+            self.instrumentation.count('entropies_computed', self.nb_time_bins)
+            for key, H in zip(keys, Hs):
+                self.entropy_cache.put(key, float(H))
+            return Hs
+        return np.array([self.entropy(d, vars1) for d in self.dists])
+    
+    #Entropies of all the non-empty subsets of the variables 'variables' in each time bin, as a dict mapping each subset (as a frozenset) to an array of shape (nb_time_bins,). With the 'numpy' backend, the whole lattice is computed in one pass (see plugin_entropy.entropy_lattice), and all these entropies are cached.
+    def entropy_lattice(self, variables):
+        subsets = [frozenset(subset) for size in range(1, len(variables) + 1) for subset in itertools.combinations(variables, size)]
+        nb_missing = sum((bin_index, subset) not in self.entropy_cache for subset in subsets for bin_index in range(self.nb_time_bins))
+        if self.backend == 'numpy' and nb_missing > 0:
+            self.entropy_cache.misses += nb_missing
+            with self.instrumentation.phase('compute_entropy'):
+                lattice = plugin_entropy.entropy_lattice(self.bins_of_observations, variables)
+            self.instrumentation.count('entropies_computed', self.nb_time_bins*len(lattice))
+            for subset, Hs in lattice.items():
+                for bin_index, H in enumerate(Hs):
+                    self.entropy_cache.put((bin_index, subset), float(H))
+            return {subset: np.asarray(lattice[subset], dtype=float) for subset in subsets}
+        return {subset: self.entropies(list(subset)) for subset in subsets}
+    
+    #The entropy lattice of 'variables' together with the multivariate measures derived from it (each variable being its own group), in each time bin. This replaces separate calls to dit.multivariate.coinformation, total_correlation and dual_total_correlation.
+    def multivariate_measures(self, variables):
+        lattice = self.entropy_lattice(variables)
+        return {'entropies': lattice,
+                'co_information': plugin_entropy.coinformation(lattice, variables),
+                'total_correlation': plugin_entropy.total_correlation(lattice, variables),
+                'dual_total_correlation': plugin_entropy.dual_total_correlation(lattice, variables)}
+    
+    def mutual_informations(self, vars1, vars2):
+        return self.entropies(vars1) + self.entropies(vars2) - self.entropies(list(vars1) + list(vars2))
+    
+    def conditional_mutual_informations(self, vars1, vars2, cond):
+        return self.entropies(list(vars1) + list(cond)) + self.entropies(list(vars2) + list(cond)) - self.entropies(cond) - self.entropies(list(vars1) + list(vars2) + list(cond))
+    
+    def NMIs(self, vars1, vars2):
+        return 2*self.mutual_informations(vars1, vars2)/(self.entropies(vars1) + self.entropies(vars2))
+    
+    def NCMIs(self, vars1, vars2, cond):
+        return 2*self.conditional_mutual_informations(vars1, vars2, cond)/(self.entropies(vars1) + self.entropies(vars2))
+    
     def PID(self, d, X1, X2, Y):#partial information decomposition
         """
         Return [I, S, R, U1, U2]
         """
-        HX = dit.shannon.entropy(d, X1 + X2, rv_mode='indices')
-        HY = dit.shannon.entropy(d, Y, rv_mode='indices')
+        if isinstance(d, np.ndarray):
+            return plugin_pid.pid(d, X1, X2, Y)
+        
+        HX = self.entropy(d, X1 + X2)
+        HY = self.entropy(d, Y)
     
-        I1 = dit.shannon.mutual_information(d, X1, Y, rv_mode='indices')
-        I2 = dit.shannon.mutual_information(d, X2, Y, rv_mode='indices')
+        I1 = self.mutual_information(d, X1, Y)
+        I2 = self.mutual_information(d, X2, Y)
         
-        MI = dit.shannon.mutual_information(d, X1 + X2, Y, rv_mode='indices')
+        MI = self.mutual_information(d, X1 + X2, Y)
         
         R = self.Imin(d, [X1, X2], Y)
         
@@ -89,6 +274,27 @@ class IT_analyzer:
         
         return 2*np.array([MI, S, R, U1, U2])/(HX + HY)
     
+    #The PIDs of a batch of (X1, X2, Y) triples in all time bins, as an array of shape (nb_triples, 5, nb_time_bins). With the 'numpy' backend, they are computed on the contingency tables of all bins at once (see plugin_pid).
+    def PIDs(self, triples):
+        if self.backend == 'numpy':
+            return plugin_pid.pids(self.bins_of_observations, triples)
+        return np.array([np.column_stack([self.PID(d, X1, X2, Y) for d in self.dists]) for X1, X2, Y in triples])
+    
+    #The mutual information between every pair of 'variables' (all the variables by default, a subset of them is much cheaper for large networks) in each time bin, as an array of shape (nb_time_bins, n, n) whose diagonal holds the entropies, or the NMIs if 'normalized' is True. Whatever the backend, all the pairs are counted at once by plugin_pairwise, which gives the same values as dit.
+    def mutual_information_matrix(self, variables=None, normalized=False):
+        with self.instrumentation.phase('pairwise_measures'):
+            MI = plugin_pairwise.mutual_information_matrix(self.bins_of_observations, variables)
+        if not normalized:
+            return MI
+        H = np.diagonal(MI, axis1=1, axis2=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return 2*MI/(H[:, :, None] + H[:, None, :])
+    
+    #The transfer entropy from every variable to every other one of 'variables' (all the variables by default), from bin t to bin t+lag, as an array of shape (nb_time_bins-lag, n, n) where entry [t, i, j] is the transfer entropy from variables[i] to variables[j] (see plugin_pairwise.transfer_entropy_matrix).
+    def transfer_entropy_matrix(self, variables=None, lag=1):
+        with self.instrumentation.phase('pairwise_measures'):
+            return plugin_pairwise.transfer_entropy_matrix(self.bins_of_observations, variables, lag)
+    
     def Imin(self, d, Xs, Y):
         """ Xs == [X1, X2] """
         
@@ -109,8 +315,8 @@ class IT_analyzer:
     
     
 class Simplex_IT_analyzer(IT_analyzer): #used in Skander's Bachelor thesis.
-    def __init__(self, path_to_file, stim='on'):
-        super().__init__(path_to_file, stim='on')
+    def __init__(self, path_to_file, stim='on', backend='dit'):
+        super().__init__(path_to_file, stim='on', backend=backend)
         
     def compute_neuron_mutual_informations(self):
         source_to_postsource = [self.NMI(d, [1], [2]) for d in self.dists]
@@ -125,15 +331,145 @@ class Simplex_IT_analyzer(IT_analyzer): #used in Skander's Bachelor thesis.
         return [source_to_postsource, source_to_sink, beforesink_to_sink]
     
     def compute_partial_information_decompositions(self):
-        source_to_postsource = np.column_stack([self.PID(d, [0] ,[1], [2]) for d in self.dists])
-        source_to_sink = np.column_stack([self.PID(d,[0], [1], [self.nb_neurons]) for d in self.dists])
-        beforesink_to_sink = np.column_stack([self.PID(d, [0], [self.nb_neurons-1], [self.nb_neurons]) for d in self.dists])
+        source_to_postsource, source_to_sink, beforesink_to_sink = self.PIDs([([0], [1], [2]), ([0], [1], [self.nb_neurons]), ([0], [self.nb_neurons-1], [self.nb_neurons])])
         return [source_to_postsource, source_to_sink, beforesink_to_sink]
     
     
+#The following analyzes whole sweeps of generate_experiments (parents_one_child when nb_children == 1, parents_two_children when nb_children == 2) at once.
+
+#Path of the observations of one point of such a sweep. With 'spikes', the path of the spike file of the sweeps run with record_spikes=True, which holds the observations of all the time bin sizes.
+def sweep_point_file(path_to_dir, nb_children, connection_type, nb_parents, tbs, sw, children_connection_type='disconnected', spikes=False):
+    if nb_children == 1:
+        directory = path_to_dir + 'parents_one_child/' + connection_type + '/'
+    else:
+        directory = path_to_dir + 'parents_two_children/' + connection_type + '_parents/' + children_connection_type + '_children/'
+    if spikes:
+        return directory + 'parents_{}_child_{}_nb_neur_{}_sw_{}_stim_off_spikes'.format(nb_parents, nb_children, nb_parents + nb_children, sw)
+    return directory + 'parents_{}_child_{}_nb_neur_{}_sw_{}_tbs_{}_stim_off'.format(nb_parents, nb_children, nb_parents + nb_children, sw, tbs)
+
+#In the measures of a sweep, a list of variables can also be 'children' or 'parents', which stand for the children (the first nb_children neurons) and the parents (all the others) of each sweep point.
+def resolve_variables(variables, nb_children, nb_neurons):
+    if isinstance(variables, str):
+        if variables == 'children':
+            return list(range(nb_children))
+        elif variables == 'parents':
+            return list(range(nb_children, nb_neurons))
+        print('Variables not identified.')
+        return None
+    return list(variables)
+
+PID_COMPONENTS = ['I', 'S', 'R', 'U1', 'U2']
+
+#The labels of the columns of the measures: one per measure, except for 'PID' which gives the 5 columns of IT_analyzer.PID.
+def measure_labels(measures):
+    labels = []
+    for name, *variables in measures:
+        arguments = ', '.join(str(vars1) for vars1 in variables)
+        if name == 'PID':
+            labels += ['PID_{}({})'.format(component, arguments) for component in PID_COMPONENTS]
+        else:
+            labels.append('{}({})'.format(name, arguments))
+    return labels
+
+#Computes the 'measures' (see Experiment_IT_analyzer.compute) on the observations in 'path_to_file', binned with 'time_bin_size' if it is given (see IT_analyzer), and returns an array of shape (nb_time_bins, nb_columns). The file is read once, and the observations are then projected onto the variables used by the measures. This is what each worker of Experiment_IT_analyzer runs.
+def analyze_sweep_point(path_to_file, measures, nb_children, backend='numpy', time_bin_size=None):
+    analyzer = IT_analyzer(path_to_file, backend=backend, time_bin_size=time_bin_size)
+    nb_neurons = len(analyzer.variables)
+    measures = [(name,) + tuple(resolve_variables(vars1, nb_children, nb_neurons) for vars1 in variables) for name, *variables in measures]
+    used_variables = sorted(set(var for name, *variables in measures for vars1 in variables for var in vars1))
+    position = {var: index for index, var in enumerate(used_variables)}
+    analyzer.project(used_variables)
+    
+    columns = []
+    for name, *variables in measures:
+        variables = [[position[var] for var in vars1] for vars1 in variables]
+        if name == 'entropy':
+            columns.append(analyzer.entropies(*variables))
+        elif name == 'mutual_information':
+            columns.append(analyzer.mutual_informations(*variables))
+        elif name == 'conditional_mutual_information':
+            columns.append(analyzer.conditional_mutual_informations(*variables))
+        elif name == 'NMI':
+            columns.append(analyzer.NMIs(*variables))
+        elif name == 'NCMI':
+            columns.append(analyzer.NCMIs(*variables))
+        elif name == 'PID':
+            columns += list(analyzer.PIDs([tuple(variables)])[0])
+        else:
+            print('Measure {} not identified.'.format(name))
+            return None
+    return np.column_stack(columns)
+
+
+"""Analyzes all the points of a sweep of generate_experiments: the grid of 'connection_types' (the parent connection types), 'nb_parents_list', 'time_bin_sizes' and 'synapse_weights' (each can also be a single value), with 'nb_children' children connected by 'children_connection_type'. The observations are read from 'path_to_dir' (as written by the sweeps), and the points are analyzed concurrently by 'nb_workers' workers (the number of cores by default), which are processes if 'executor' == 'process' and threads if 'executor' == 'thread'. With nb_workers == 1, the points are analyzed one after the other in the current process.
+If 'spikes' is True, the observations are read from the spike files of sweeps run with record_spikes=True (see generate_experiments), and binned with the time bin size of each point, so that all the time bin sizes are analyzed from a single simulation.
+self.points is the list of the sweep points, as dicts {'connection_type', 'nb_parents', 'time_bin_size', 'synapse_weight'}, in the order of itertools.product of the grid (so that the results can be reshaped to self.grid_shape)."""
 class Experiment_IT_analyzer:
     
-    def __inti__(self, path_to_dir, xaxis, tbs, sw):
-        self.nb_children=2 #this is adapted to the experiment to two children
-        self.path_to_dir= 'observations/parent_two_children/'+connection_type+'_parents/' + children_connection_type + '_children/'
-        self.analyzs= [[IT_analyzer(PATH_TO_DIR+'parents_{}_child_2_nb_neur_{}_sw_{}_tbs_{}_stim_off'.format(i, i+2, sw, tbs)) for i in xaxis]]
\ No newline at end of file
+    def __init__(self, connection_types, nb_parents_list, time_bin_sizes, synapse_weights, nb_children=2, children_connection_type='disconnected', path_to_dir='observations/', backend='numpy', nb_workers=None, executor='process', spikes=False):
+        grid = [[connection_types] if isinstance(connection_types, str) else list(connection_types)]
+        grid += [list(np.atleast_1d(values).tolist()) for values in [nb_parents_list, time_bin_sizes, synapse_weights]]
+        self.grid_shape = tuple(len(values) for values in grid)
+        self.points = [{'connection_type': connection_type, 'nb_parents': nb_parents, 'time_bin_size': tbs, 'synapse_weight': sw}
+                       for connection_type, nb_parents, tbs, sw in itertools.product(*grid)]
+        self.nb_children = nb_children
+        self.paths = [sweep_point_file(path_to_dir, nb_children, point['connection_type'], point['nb_parents'], point['time_bin_size'], point['synapse_weight'], children_connection_type, spikes)
+                      for point in self.points]
+        self.time_bin_sizes = [point['time_bin_size'] if spikes else None for point in self.points]
+        self.backend = backend
+        self.nb_workers = nb_workers if nb_workers is not None else (os.cpu_count() or 1)
+        self.executor = executor
+    
+    """Computes the 'measures' at every sweep point. A measure is a tuple (name, vars1, ...) with name among 'entropy' (vars1), 'mutual_information' (vars1, vars2), 'conditional_mutual_information' (vars1, vars2, cond), 'NMI' (vars1, vars2), 'NCMI' (vars1, vars2, cond) and 'PID' (X1, X2, Y), where the variables are lists of neuron indices, 'children' or 'parents'. For example [('mutual_information', [0], [1]), ('conditional_mutual_information', [0], [1], 'parents')].
+    Returns a dict with:
+        - 'points': self.points, and 'measures': the labels of the columns (see measure_labels).
+        - 'values': array of shape (nb_points, nb_time_bins, nb_columns), the measures in each time bin. The sweep points with fewer time bins (larger time bin sizes) are padded with nan, as are the points whose observations are missing or cannot be binned with the time bin size of the point.
+        - 'mean' and 'standard_error': arrays of shape (nb_points, nb_columns), the mean of the measures over the time bins and its standard error."""
+    def compute(self, measures):
+        if self.nb_workers == 1:
+            results = [self.analyze(path_to_file, measures, time_bin_size) for path_to_file, time_bin_size in zip(self.paths, self.time_bin_sizes)]
+        else:
+            pool = ProcessPoolExecutor if self.executor == 'process' else ThreadPoolExecutor
+            with pool(max_workers=self.nb_workers) as executor:
+                futures = [executor.submit(analyze_sweep_point, path_to_file, measures, self.nb_children, self.backend, time_bin_size) for path_to_file, time_bin_size in zip(self.paths, self.time_bin_sizes)]
+                results = [self.result(future, path_to_file) for future, path_to_file in zip(futures, self.paths)]
+        
+        labels = measure_labels(measures)
+        nb_time_bins = max([len(result) for result in results if result is not None], default=0)
+        values = np.full((len(self.points), nb_time_bins, len(labels)), np.nan)
+        for point_index, result in enumerate(results):
+            if result is not None:
+                values[point_index, :len(result)] = result
+        
+        nb_valid_bins = np.sum(~np.isnan(values), axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.nansum(values, axis=1)/nb_valid_bins
+            standard_error = np.sqrt(np.nansum((values - mean[:, None, :])**2, axis=1)/(nb_valid_bins - 1)/nb_valid_bins)
+        return {'points': self.points, 'measures': labels, 'values': values, 'mean': mean, 'standard_error': standard_error}
+    
+    def analyze(self, path_to_file, measures, time_bin_size=None):
+        try:
+            return analyze_sweep_point(path_to_file, measures, self.nb_children, self.backend, time_bin_size)
+        except FileNotFoundError:
+            print('No observations in {}.'.format(path_to_file))
+            return None
+        except ValueError as error:
+            print(error)
+            return None
+    
+    def result(self, future, path_to_file):
+        try:
+            return future.result()
+        except FileNotFoundError:
+            print('No observations in {}.'.format(path_to_file))
+            return None
+        except ValueError as error:
+            print(error)
+            return None
+
+#Builds the analyzer of the cached observations of 'configuration' (see Simulation.configuration) in the result_cache.ResultCache 'cache', or returns None if this configuration was never simulated.
+def cached_IT_analyzer(cache, configuration, **kwargs):
+    path_to_file = cache.lookup(configuration)
+    if path_to_file is None:
+        return None
+    return IT_analyzer(path_to_file, stim=configuration['stim'], **kwargs)
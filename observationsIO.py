@@ -1,3 +1,6 @@
+import json
+import os
+import numpy as np
 #reads and writes observations:
 
 def write_observations(observations, path_to_file):
@@ -7,7 +10,11 @@ def write_observations(observations, path_to_file):
             for observation in time_bin:
                 file.write(','.join(str(obs) for obs in observation) + '\n')
 
+#Reads the observations in 'path_to_file' as a list of bins, each bin being a list of tuples (one per trial). The text format, the binary format and the spike files below are all accepted.
 def read_observations(path_to_file):
+    if is_binary_observations(path_to_file) or is_spike_file(path_to_file):
+        return [[tuple(observation) for observation in time_bin] for time_bin in read_observation_array(path_to_file).astype(float).tolist()]
+
     observations = []
     with open(path_to_file, 'r') as file:
         for line in file.readlines():
@@ -16,5 +23,148 @@ def read_observations(path_to_file):
                 continue
             observation = tuple(float(obs) for obs in line.strip().split(','))
             observations[-1].append(observation)
-            
+
     return observations
+
+
+#The binary format is the following: the magic string below, the length of the header as a little-endian uint32, the header (a json dict holding the dtype and shape of the observations and the metadata of the simulation, see Simulation.observation_metadata), and then the raw array of observations of shape (nb_bins, n_monte_carlo, stim+nb_neurons). The array starts at a multiple of 64 bytes so that it can be memory-mapped.
+BINARY_MAGIC = b'NEUROTOP_OBS_V1\n'
+BINARY_ALIGNMENT = 64
+
+def is_binary_observations(path_to_file):
+    with open(path_to_file, 'rb') as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+#Writes 'observations' (anything that numpy can turn into an array of shape (nb_bins, n_monte_carlo, stim+nb_neurons)) in the binary format. Spike counts and stimulus values are integers, so they are stored with the smallest unsigned integer type that holds them.
+def write_observations_binary(observations, path_to_file, metadata=None):
+    observations = np.rint(np.asarray(observations)).astype(np.int64)
+    if observations.ndim != 3:
+        print('observations should have shape (nb_bins, n_monte_carlo, stim+nb_neurons).')
+        return None
+    max_value = int(observations.max()) if observations.size > 0 else 0
+    observations = observations.astype(np.min_scalar_type(max_value))
+
+    header = json.dumps({
+        'dtype': observations.dtype.str,
+        'shape': list(observations.shape),
+        'metadata': metadata if metadata is not None else {}},
+        default=lambda value: value.item()).encode('utf-8') #numpy scalars (e.g. from np.arange sweeps) are not json serializable
+    data_offset = len(BINARY_MAGIC) + 4 + len(header)
+    padding = -data_offset % BINARY_ALIGNMENT
+
+    with open(path_to_file, 'wb') as file:
+        file.write(BINARY_MAGIC)
+        file.write(np.uint32(len(header) + padding).astype('<u4').tobytes())
+        file.write(header + b' '*padding)
+        file.write(np.ascontiguousarray(observations).tobytes())
+
+def read_binary_header(path_to_file):
+    with open(path_to_file, 'rb') as file:
+        if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+            print('{} is not a binary observations file.'.format(path_to_file))
+            return None
+        header_length = int(np.frombuffer(file.read(4), dtype='<u4')[0])
+        header = json.loads(file.read(header_length).decode('utf-8'))
+    header['offset'] = len(BINARY_MAGIC) + 4 + header_length
+    return header
+
+#Returns the metadata of the simulation stored in a binary or spike file, and an empty dict for a text file (which has none).
+def read_metadata(path_to_file):
+    if is_spike_file(path_to_file):
+        return read_spikes_header(path_to_file)['metadata']
+    if not is_binary_observations(path_to_file):
+        return {}
+    return read_binary_header(path_to_file)['metadata']
+
+#Reads the observations in 'path_to_file' as an array of shape (nb_bins, n_monte_carlo, stim+nb_neurons). A binary file is memory-mapped (unless 'mmap' is False), so that slicing a bin or a few neurons only reads that part of the file. A text file is parsed entirely.
+#If 'time_bin_size' is given, the observations are aggregated to bins of this size (in ms): a spike file (see below) can be binned to any divisor of its duration, and a binary file to any multiple of its own time bin size that divides its duration (see rebin_observations). Without 'time_bin_size', a spike file is binned to the time bin size of the simulation that wrote it.
+def read_observation_array(path_to_file, mmap=True, time_bin_size=None):
+    if is_spike_file(path_to_file):
+        return spikes_to_observations(read_spikes(path_to_file), time_bin_size)
+    if time_bin_size is not None:
+        metadata = read_metadata(path_to_file)
+        if metadata.get('time_bin_size') is None:
+            print('The time bin size of {} is unknown, so it cannot be re-binned.'.format(path_to_file))
+            return None
+        return rebin_observations(read_observation_array(path_to_file, mmap), time_bin_size//metadata['time_bin_size'] if time_bin_size % metadata['time_bin_size'] == 0 else None, metadata.get('stim', 'off'))
+    if not is_binary_observations(path_to_file):
+        return np.array(read_observations(path_to_file))
+
+    header = read_binary_header(path_to_file)
+    shape = tuple(header['shape'])
+    if 0 in shape:
+        return np.zeros(shape, dtype=header['dtype'])
+    observations = np.memmap(path_to_file, dtype=header['dtype'], mode='r', offset=header['offset'], shape=shape)
+    if not mmap:
+        return np.array(observations)
+    return observations
+
+#Converts a text file of observations to the binary format. If 'path_to_binary' is None, the text file is replaced by its binary version.
+def convert_text_to_binary(path_to_text, path_to_binary=None, metadata=None):
+    observations = read_observations(path_to_text)
+    if path_to_binary is None:
+        write_observations_binary(observations, path_to_text + '.tmp', metadata)
+        os.replace(path_to_text + '.tmp', path_to_text)
+    else:
+        write_observations_binary(observations, path_to_binary, metadata)
+
+
+#Aggregates observations of shape (nb_bins, n_monte_carlo, stim+nb_neurons) to bins 'factor' times larger: the spike counts are summed, and the stimulus column (when stim == 'on') takes its value at the end of the new bin, as in Simulation.update_time_bin.
+def rebin_observations(observations, factor, stim='off'):
+    nb_bins = len(observations)
+    if factor is None or factor < 1 or nb_bins % factor != 0:
+        print('The observations can only be re-binned to a multiple of their time bin size that divides their duration.')
+        return None
+    observations = np.asarray(observations)
+    rebinned = observations.reshape((nb_bins//factor, factor) + observations.shape[1:]).sum(axis=1, dtype=np.int64)
+    if stim == 'on':
+        rebinned[:, :, 0] = observations[factor-1::factor, :, 0]
+    return rebinned
+
+
+#Spike files hold the spikes of all the trials of a simulation at the resolution of the simulation (dt = 1ms), so that they can be binned to any time bin size when they are read, instead of simulating again for every time bin size. They are written by Simulation.simulate(..., file_format='spikes').
+#A spike file is a numpy .npz archive of the arrays 'trials', 'steps' and 'neurons' (the i-th spike is the one of neuron neurons[i] at time step steps[i] of trial trials[i], stored with the smallest integer types that hold them), 'stimulus' (the value of the stimulus at each time step, empty when stim == 'off') and 'header', a json dict holding nb_trials, nb_neurons, nb_steps, dt (in ms) and the metadata of the simulation.
+SPIKES_MAGIC = b'PK\x03\x04' #the magic of zip archives, and so of .npz files
+
+def is_spike_file(path_to_file):
+    with open(path_to_file, 'rb') as file:
+        return file.read(len(SPIKES_MAGIC)) == SPIKES_MAGIC
+
+def write_spikes(path_to_file, trials, steps, neurons, nb_trials, nb_neurons, nb_steps, stimulus=None, dt=1, metadata=None):
+    header = json.dumps({'nb_trials': nb_trials, 'nb_neurons': nb_neurons, 'nb_steps': nb_steps, 'dt': dt,
+                         'metadata': metadata if metadata is not None else {}}, default=lambda value: value.item())
+    with open(path_to_file, 'wb') as file: #through a file object, as np.savez would add '.npz' to the name
+        np.savez(file, header=np.array(header),
+                 trials=np.asarray(trials).astype(np.min_scalar_type(max(nb_trials - 1, 0))),
+                 steps=np.asarray(steps).astype(np.min_scalar_type(max(nb_steps - 1, 0))),
+                 neurons=np.asarray(neurons).astype(np.min_scalar_type(max(nb_neurons - 1, 0))),
+                 stimulus=np.asarray(stimulus if stimulus is not None else [], dtype=np.int64))
+
+#Returns the content of a spike file as a dict with the header entries and the arrays.
+def read_spikes(path_to_file):
+    with np.load(path_to_file) as archive:
+        spikes = json.loads(str(archive['header']))
+        for name in ['trials', 'steps', 'neurons', 'stimulus']:
+            spikes[name] = archive[name]
+    return spikes
+
+def read_spikes_header(path_to_file):
+    with np.load(path_to_file) as archive:
+        return json.loads(str(archive['header']))
+
+#Bins the spikes of read_spikes with bins of 'time_bin_size' ms (which has to divide the duration), the time bin size of the simulation by default. Returns an int array of shape (nb_bins, nb_trials, stim+nb_neurons), laid out as the observations of Simulation.simulate.
+def spikes_to_observations(spikes, time_bin_size=None):
+    if time_bin_size is None:
+        time_bin_size = spikes['metadata']['time_bin_size']
+    steps_per_bin = int(round(time_bin_size/spikes['dt']))
+    nb_trials, nb_neurons, nb_steps = spikes['nb_trials'], spikes['nb_neurons'], spikes['nb_steps']
+    if steps_per_bin < 1 or nb_steps % steps_per_bin != 0:
+        print('The time bin size has to divide the duration.')
+        return None
+    nb_bins = nb_steps//steps_per_bin
+    flat_indices = ((spikes['steps'].astype(np.int64)//steps_per_bin)*nb_trials + spikes['trials'])*nb_neurons + spikes['neurons']
+    spike_counts = np.bincount(flat_indices, minlength=nb_bins*nb_trials*nb_neurons).reshape(nb_bins, nb_trials, nb_neurons)
+    if len(spikes['stimulus']) > 0:
+        stim_values = spikes['stimulus'][np.arange(1, nb_bins+1)*steps_per_bin - 1] #the stimulus at the end of each bin
+        spike_counts = np.concatenate([np.broadcast_to(stim_values[:, None, None], (nb_bins, nb_trials, 1)), spike_counts], axis=2)
+    return spike_counts
@@ -0,0 +1,133 @@
+import itertools
+import numpy as np
+#Vectorized plug-in estimators of the information-theoretic quantities used in new_it_analyzer, working directly on arrays of observations.
+#Observations have shape (nb_bins, n_monte, stim+nb_neur) (as returned by observationsIO.read_observation_array), or (n_monte, stim+nb_neur) for a single bin.
+#Variables are given by their indices (like rv_mode='indices' in dit), and all quantities are in bits, so they agree with dit up to numerical precision.
+
+
+#Encodes the rows of 'observations' restricted to the columns 'variables' as integers: two rows get the same code iff they agree on all these columns. Returns the codes (of shape observations.shape[:-1]) and an upper bound on the codes.
+def encode_rows(observations, variables):
+    observations = np.asarray(observations)
+    shape = observations.shape[:-1]
+    nb_rows = int(np.prod(shape))
+    codes = np.zeros(nb_rows, dtype=np.int64)
+    nb_codes = 1
+    for var in variables:
+        values, column_codes = np.unique(observations[..., var].ravel(), return_inverse=True)
+        if nb_codes*len(values) > nb_rows:
+            codes, nb_codes = compress_codes(codes) #so that the codes never overflow.
+        codes = codes*len(values) + column_codes.ravel()
+        nb_codes *= len(values)
+    return codes.reshape(shape), nb_codes
+
+#Entropy of the variables 'variables' in each time bin, all bins being counted at once. Returns an array of shape (nb_bins,), or a float if 'observations' is a single bin.
+def entropy(observations, variables):
+    observations = np.asarray(observations)
+    if observations.ndim == 2:
+        return float(entropy(observations[None], variables)[0])
+
+    nb_bins, nb_trials = observations.shape[:2]
+    if len(variables) == 0 or nb_trials == 0:
+        return np.zeros(nb_bins)
+
+    codes, nb_codes = encode_rows(observations, list(variables))
+    return entropy_of_codes(codes, nb_codes)
+
+#Entropy in each time bin of integer codes of shape (nb_bins, n_monte) that are smaller than 'nb_codes'.
+def entropy_of_codes(codes, nb_codes):
+    nb_bins, nb_trials = codes.shape
+    if nb_codes > codes.size:
+        codes, nb_codes = compress_codes(codes)
+    keys, counts = np.unique(np.arange(nb_bins)[:, None]*nb_codes + codes, return_counts=True)
+    probabilities = counts/nb_trials
+    return -np.bincount(keys//nb_codes, weights=probabilities*np.log2(probabilities), minlength=nb_bins)
+
+#Relabels codes to 0,...,nb_distinct_codes-1.
+def compress_codes(codes):
+    values, compressed = np.unique(codes.ravel(), return_inverse=True)
+    return compressed.reshape(codes.shape), max(len(values), 1)
+
+#Entropies of all the non-empty subsets of 'variables', in each time bin. Each variable is encoded once, and the code of a subset is obtained from the code of the subset without its last variable, so the whole lattice costs one counting pass per subset. Returns a dict mapping each subset (as a frozenset) to an array of shape (nb_bins,).
+def entropy_lattice(observations, variables):
+    observations = np.asarray(observations)
+    if observations.ndim == 2:
+        observations = observations[None]
+    variables = list(variables)
+    subset_codes = {frozenset(): (np.zeros(observations.shape[:2], dtype=np.int64), 1)}
+    variable_codes = {var: compress_codes(observations[..., var]) for var in variables}
+    lattice = {}
+    for size in range(1, len(variables) + 1):
+        for subset in itertools.combinations(variables, size):
+            codes, nb_codes = subset_codes[frozenset(subset[:-1])]
+            last_codes, nb_last_codes = variable_codes[subset[-1]]
+            codes, nb_codes = compress_codes(codes*nb_last_codes + last_codes)
+            subset_codes[frozenset(subset)] = (codes, nb_codes)
+            lattice[frozenset(subset)] = entropy_of_codes(codes, nb_codes)
+    return lattice
+
+#Multivariate measures of the variables (each variable being its own group, like [[0], [1], [2]] in dit.multivariate) derived from their entropy lattice, in each time bin.
+def coinformation(lattice, variables):
+    return sum((-1)**(len(subset) + 1)*lattice[frozenset(subset)] for size in range(1, len(variables) + 1) for subset in itertools.combinations(variables, size))
+
+def total_correlation(lattice, variables):
+    return sum(lattice[frozenset([var])] for var in variables) - lattice[frozenset(variables)]
+
+def dual_total_correlation(lattice, variables):
+    return sum(lattice[frozenset(variables) - {var}] if len(variables) > 1 else 0 for var in variables) - (len(variables) - 1)*lattice[frozenset(variables)]
+
+def mutual_information(observations, vars1, vars2):
+    return entropy(observations, vars1) + entropy(observations, vars2) - entropy(observations, list(vars1) + list(vars2))
+
+def conditional_entropy(observations, vars1, cond):
+    return entropy(observations, list(vars1) + list(cond)) - entropy(observations, cond)
+
+def conditional_mutual_information(observations, vars1, vars2, cond):
+    return conditional_entropy(observations, vars1, cond) - conditional_entropy(observations, vars1, list(vars2) + list(cond))
+
+def normalized_mutual_information(observations, vars1, vars2):
+    return 2*mutual_information(observations, vars1, vars2)/(entropy(observations, vars1) + entropy(observations, vars2))
+
+def normalized_conditional_mutual_information(observations, vars1, vars2, cond):
+    return 2*conditional_mutual_information(observations, vars1, vars2, cond)/(entropy(observations, vars1) + entropy(observations, vars2))
+
+
+#The following estimate how precise the plug-in estimates are, to decide when enough trials were simulated (see Simulation.simulate(..., precision=...)).
+#A measure is one of ('entropy', vars1), ('mutual_information', vars1, vars2) or ('conditional_mutual_information', vars1, vars2, cond), which are linear combinations of entropies, given as a list of (coefficient, variables).
+def measure_terms(measure):
+    name, variables = measure[0], [list(vars1) for vars1 in measure[1:]]
+    if name == 'entropy':
+        return [(1, variables[0])]
+    elif name == 'mutual_information':
+        vars1, vars2 = variables
+        return [(1, vars1), (1, vars2), (-1, vars1 + vars2)]
+    elif name == 'conditional_mutual_information':
+        vars1, vars2, cond = variables
+        return [(1, vars1 + cond), (1, vars2 + cond), (-1, cond), (-1, vars1 + vars2 + cond)]
+    else:
+        print('Measure not identified.')
+        return None
+
+def measure(observations, measure):
+    return sum(coefficient*entropy(observations, vars1) for coefficient, vars1 in measure_terms(measure))
+
+#Error of the plug-in estimate of 'measure' in each time bin. The standard error uses that the plug-in estimate of a sum of entropies sum_S c_S H(S) has asymptotic variance Var(sum_S -c_S log2 p(x_S))/n over the trials, and the bias is the Miller-Madow correction sum_S c_S (K_S - 1)/(2 n ln 2), K_S being the number of outcomes of S. Returns sqrt(standard_error**2 + bias**2).
+def estimation_error(observations, measure):
+    observations = np.asarray(observations)
+    nb_bins, nb_trials = observations.shape[:2]
+    if nb_trials < 2:
+        return np.full(nb_bins, np.inf)
+    surprises = np.zeros((nb_bins, nb_trials))
+    bias = np.zeros(nb_bins)
+    for coefficient, vars1 in measure_terms(measure):
+        if len(vars1) == 0:
+            continue
+        codes, nb_codes = encode_rows(observations, vars1)
+        codes, nb_codes = compress_codes(np.arange(nb_bins)[:, None]*nb_codes + codes)
+        counts = np.bincount(codes.ravel(), minlength=nb_codes)
+        surprises -= coefficient*np.log2(counts[codes]/nb_trials)
+        bin_of_code = np.zeros(nb_codes, dtype=np.int64) #the codes are compressed, so every code is the outcome of a single bin
+        bin_of_code[codes.ravel()] = np.repeat(np.arange(nb_bins), nb_trials)
+        nb_outcomes = np.bincount(bin_of_code, minlength=nb_bins)
+        bias += coefficient*(nb_outcomes - 1)/(2*nb_trials*np.log(2))
+    standard_error = np.sqrt(surprises.var(axis=1, ddof=1)/nb_trials)
+    return np.sqrt(standard_error**2 + bias**2)
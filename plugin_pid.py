@@ -0,0 +1,66 @@
+import numpy as np
+from plugin_entropy import encode_rows, compress_codes
+#Vectorized partial information decomposition (with the Imin redundancy of Williams and Beer, as in new_it_analyzer.IT_analyzer.Imin), computed on dense contingency tables p(x1, x2, y) stacked over all the time bins.
+#Observations have shape (nb_bins, n_monte, stim+nb_neur), and X1, X2 and Y are lists of indices of variables.
+
+
+#Returns p of shape (nb_bins, K1, K2, KY) where p[b, i, j, k] is the probability in bin b that X1, X2 and Y take their i-th, j-th and k-th values.
+def contingency_tables(observations, X1, X2, Y, codes=None):
+    observations = np.asarray(observations)
+    nb_bins, nb_trials = observations.shape[:2]
+    if codes is None:
+        codes = {}
+    sizes = []
+    flat_indices = np.arange(nb_bins)[:, None]
+    for X in [X1, X2, Y]:
+        if tuple(X) not in codes:
+            codes[tuple(X)] = compress_codes(encode_rows(observations, X)[0])
+        X_codes, nb_codes = codes[tuple(X)]
+        flat_indices = flat_indices*nb_codes + X_codes
+        sizes.append(nb_codes)
+    counts = np.bincount(flat_indices.ravel(), minlength=nb_bins*int(np.prod(sizes)))
+    return counts.reshape([nb_bins] + sizes)/nb_trials
+
+def entropy_of_table(p, axes):
+    #entropy of the marginal of p on 'axes' (the axes other than the bin axis 0), for each bin.
+    marginal = p.sum(axis=tuple(axis for axis in range(1, p.ndim) if axis not in axes))
+    return -np.sum(np.where(marginal > 0, marginal*np.log2(np.where(marginal > 0, marginal, 1)), 0), axis=tuple(range(1, marginal.ndim)))
+
+#Specific information I(Y=y; X) = sum_x p(x|y) log2(p(y|x)/p(y)) for each bin and each y, from p(x, y) of shape (nb_bins, KX, KY).
+def specific_information(p_xy):
+    p_x = p_xy.sum(axis=2, keepdims=True)
+    p_y = p_xy.sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pointwise = np.where(p_xy > 0, p_xy/p_y*np.log2(p_xy/(p_x*p_y)), 0)
+    return pointwise.sum(axis=1)
+
+#Imin redundancy sum_y p(y) min(I(Y=y; X1), I(Y=y; X2)) for each bin.
+def imin(p):
+    p_y = p.sum(axis=(1, 2))
+    return np.sum(p_y*np.minimum(specific_information(p.sum(axis=2)), specific_information(p.sum(axis=1))), axis=1)
+
+#Returns the array of shape (5, nb_bins) of [MI, S, R, U1, U2], normalized by (H(X1, X2) + H(Y))/2 like IT_analyzer.PID.
+def pid_of_table(p):
+    HX = entropy_of_table(p, [1, 2])
+    HY = entropy_of_table(p, [3])
+    I1 = entropy_of_table(p, [1]) + HY - entropy_of_table(p, [1, 3])
+    I2 = entropy_of_table(p, [2]) + HY - entropy_of_table(p, [2, 3])
+    MI = HX + HY - entropy_of_table(p, [1, 2, 3])
+
+    R = imin(p)
+    U1 = I1 - R
+    U2 = I2 - R
+    S = MI - R - U1 - U2
+    return 2*np.array([MI, S, R, U1, U2])/(HX + HY)
+
+def pid(observations, X1, X2, Y):
+    observations = np.asarray(observations)
+    if observations.ndim == 2:
+        return pid(observations[None], X1, X2, Y)[:, 0]
+    return pid_of_table(contingency_tables(observations, X1, X2, Y))
+
+#The PIDs of a batch of (X1, X2, Y) triples, as an array of shape (nb_triples, 5, nb_bins). The codes of a set of variables are shared by all the triples that use it.
+def pids(observations, triples):
+    observations = np.asarray(observations)
+    codes = {}
+    return np.array([pid_of_table(contingency_tables(observations, X1, X2, Y, codes)) for X1, X2, Y in triples])
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import observationsIO
+
+#A cache of simulation results, addressed by a hash of the complete configuration of the simulation (see Simulation.configuration): two simulations share an entry iff they have the same connections, neuron model, duration, stimulus, number of trials and seed.
+#The observations of each configuration are stored in the binary format of observationsIO as path_to_dir/<hash>.obs, and the parameters of its configuration in path_to_dir/<hash>.json, so that cached results can be queried by parameter (see read_index).
+#Several processes can store results in the same cache at once (e.g. the workers of sweep_runner.run_sweep or of sharded_simulation): every file is written under a unique temporary name and then renamed, and there is no shared index file that two processes would have to update.
+
+def configuration_key(configuration):
+    canonical = json.dumps(configuration, sort_keys=True, separators=(',', ':'), default=lambda value: np.asarray(value).tolist())
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResultCache:
+    def __init__(self, path_to_dir):
+        self.path_to_dir = path_to_dir
+        os.makedirs(path_to_dir, exist_ok=True)
+
+    def path(self, configuration):
+        return os.path.join(self.path_to_dir, configuration_key(configuration) + '.obs')
+
+    #Returns the path of the cached observations of 'configuration', or None if it was never stored.
+    def lookup(self, configuration):
+        path_to_file = self.path(configuration)
+        if os.path.isfile(path_to_file):
+            return path_to_file
+        return None
+
+    #Returns the cached observations of 'configuration' as an array of shape (nb_bins, n_monte_carlo, stim+nb_neurons), or None if it was never stored.
+    def load(self, configuration, mmap=True):
+        path_to_file = self.lookup(configuration)
+        if path_to_file is None:
+            return None
+        return observationsIO.read_observation_array(path_to_file, mmap=mmap)
+
+    def store(self, configuration, observations, metadata=None):
+        key = configuration_key(configuration)
+        path_to_file = self.path(configuration)
+        path_to_tmp = self.temporary_file(key)
+        observationsIO.write_observations_binary(observations, path_to_tmp, metadata)
+        os.replace(path_to_tmp, path_to_file)
+
+        #The entry only holds the parameters of the configuration (not the connections, which can be large), together with the number of synapses.
+        entry = {name: value for name, value in configuration.items() if name not in ['pre_syn', 'pos_syn']}
+        entry['nb_synapses'] = len(configuration.get('pre_syn', []))
+        path_to_tmp = self.temporary_file(key)
+        with open(path_to_tmp, 'w') as file:
+            json.dump(entry, file, indent=1, sort_keys=True, default=lambda value: np.asarray(value).tolist())
+        os.replace(path_to_tmp, os.path.join(self.path_to_dir, key + '.json'))
+        return path_to_file
+
+    #A new file of the cache directory, whose name no other process uses.
+    def temporary_file(self, key):
+        file_descriptor, path_to_tmp = tempfile.mkstemp(prefix=key + '.', suffix='.tmp', dir=self.path_to_dir)
+        os.close(file_descriptor)
+        return path_to_tmp
+
+    #Maps the hash of every stored configuration to its parameters, read from the <hash>.json files.
+    def read_index(self):
+        index = {}
+        for file_name in os.listdir(self.path_to_dir):
+            if file_name.endswith('.json'):
+                with open(os.path.join(self.path_to_dir, file_name), 'r') as file:
+                    index[file_name[:-len('.json')]] = json.load(file)
+        return index
+
+    #Returns the paths of the cached results whose configuration has all the given parameters, e.g. query(nb_neurons=22, synapse_weight=10).
+    def query(self, **parameters):
+        return [os.path.join(self.path_to_dir, key + '.obs') for key, entry in self.read_index().items()
+                if all(entry.get(name) == value for name, value in parameters.items())]
@@ -0,0 +1,87 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import observationsIO
+import sweep_runner
+#Splits the trials of a single configuration across processes, for the configurations that are too slow for one core (e.g. a 196-neuron torus with 500 trials).
+#The n_monte_carlo trials are cut into shards of 'shard_size' trials. Shard k is simulated with its own seed, derived from the base seed and k only (see shard_seed), and written in its own binary file. The shards are then merged in the order of k.
+#As neither the shards nor their seeds depend on the number of workers, the merged observations are bit-identical whatever the number of workers, and re-running with the same base seed gives the same observations.
+
+
+#The seed of shard 'shard_index': an independent stream of numpy's SeedSequence, reduced to a 32 bit int as brian2's seed() needs.
+def shard_seed(base_seed, shard_index):
+    return int(np.random.SeedSequence(base_seed, spawn_key=(shard_index,)).generate_state(1)[0])
+
+def shard_sizes(n_monte_carlo, shard_size):
+    return [min(shard_size, n_monte_carlo - first_trial) for first_trial in range(0, n_monte_carlo, shard_size)]
+
+def shard_file(path_to_file, shard_index):
+    return path_to_file + '.shard_{:04d}'.format(shard_index)
+
+#A shard is complete if its file holds the expected number of bins and trials, so that shards cut by an interruption are simulated again, and if it was simulated with the expected seed, so that shards left by a run with another base seed are never mixed with the others.
+def is_complete_shard(path_to_shard, nb_bins, nb_trials, seed):
+    if not os.path.isfile(path_to_shard) or not observationsIO.is_binary_observations(path_to_shard):
+        return False
+    header = observationsIO.read_binary_header(path_to_shard)
+    nb_bytes = header['offset'] + int(np.prod(header['shape']))*np.dtype(header['dtype']).itemsize
+    return header['shape'][:2] == [nb_bins, nb_trials] and header['metadata'].get('seed') == seed and os.path.getsize(path_to_shard) >= nb_bytes
+
+#Simulates one shard in the current process and writes it in 'path_to_shard'. Brian2 is only imported here, so that the workers import it themselves.
+def run_shard(simulation_kwargs, nb_trials, seed, path_to_shard, batched=False, compile_cache_dir=None):
+    import simulation
+    if compile_cache_dir is not None:
+        simulation.set_compile_cache(compile_cache_dir)
+    ex = simulation.Simulation(seed=seed, **simulation_kwargs)
+    observations = ex.simulate(nb_trials, None, batched=batched)
+    observationsIO.write_observations_binary(observations, path_to_shard + '.tmp', dict(ex.observation_metadata(), seed=seed))
+    os.replace(path_to_shard + '.tmp', path_to_shard)
+    return path_to_shard
+
+#Concatenates the shards along the trial axis, in the given order, and returns the observations as an array of shape (nb_bins, n_monte_carlo, stim+nb_neurons).
+def merge_shards(paths_to_shards):
+    return np.concatenate([observationsIO.read_observation_array(path_to_shard, mmap=False) for path_to_shard in paths_to_shards], axis=1)
+
+"""Simulates the 'n_monte_carlo' trials of the Simulation with keyword arguments 'simulation_kwargs' (nb_neurons, synapse_weight, time_bin_size, pre_syn, pos_syn, name, ...: everything but the seed) on 'nb_workers' processes (the number of cores by default), and returns the observations.
+    - 'base_seed': int, the seed from which the seeds of the shards are derived. If None, a random one is drawn and printed, and it is stored in the metadata of binary files, so that the simulation can be reproduced.
+    - 'shard_size': int, the number of trials of each shard. The observations depend on it (but not on nb_workers).
+    - 'batched': bool, whether each shard is simulated as a batch (see Simulation.simulate).
+    - 'path_to_dir': string or None. If not None, the merged observations are written in path_to_dir with the same file name as Simulation.simulate, in 'file_format' ('text' or 'binary'). The shards are written next to it (as <file>.shard_0000, ...), and they are deleted after the merge unless 'keep_shards' is True. Shards that are already complete (with the same base seed) are not simulated again, so an interrupted simulation resumes where it stopped.
+    - 'compile_cache_dir': string, optional, see simulation.set_compile_cache."""
+def simulate_sharded(simulation_kwargs, n_monte_carlo, path_to_dir, base_seed=None, nb_workers=None, shard_size=50, batched=False, file_format='text', keep_shards=False, compile_cache_dir=None):
+    if base_seed is None:
+        base_seed = int(np.random.SeedSequence().generate_state(1)[0])
+        print('base seed: {}'.format(base_seed))
+    if path_to_dir is None:
+        with tempfile.TemporaryDirectory() as temporary_dir:
+            return simulate_sharded(simulation_kwargs, n_monte_carlo, temporary_dir + '/', base_seed, nb_workers, shard_size, batched, 'binary', False, compile_cache_dir)
+    os.makedirs(path_to_dir, exist_ok=True)
+    path_to_file = sweep_runner.job_output({'path_to_dir': path_to_dir, 'simulation': simulation_kwargs})
+
+    nb_bins = simulation_kwargs.get('duration', 1000)//simulation_kwargs['time_bin_size']
+    sizes = shard_sizes(n_monte_carlo, shard_size)
+    paths_to_shards = [shard_file(path_to_file, shard_index) for shard_index in range(len(sizes))]
+    to_run = [(shard_index, nb_trials) for shard_index, nb_trials in enumerate(sizes) if not is_complete_shard(paths_to_shards[shard_index], nb_bins, nb_trials, shard_seed(base_seed, shard_index))]
+
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+    if nb_workers == 1:
+        for shard_index, nb_trials in to_run:
+            run_shard(simulation_kwargs, nb_trials, shard_seed(base_seed, shard_index), paths_to_shards[shard_index], batched, compile_cache_dir)
+    else:
+        with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+            futures = [executor.submit(run_shard, simulation_kwargs, nb_trials, shard_seed(base_seed, shard_index), paths_to_shards[shard_index], batched, compile_cache_dir)
+                       for shard_index, nb_trials in to_run]
+            for future in futures:
+                future.result()
+
+    observations = merge_shards(paths_to_shards)
+    metadata = dict(observationsIO.read_metadata(paths_to_shards[0]), n_monte_carlo=n_monte_carlo, seed=base_seed, shard_size=shard_size, batched=batched)
+    if file_format == 'binary':
+        observationsIO.write_observations_binary(observations, path_to_file, metadata)
+    else:
+        observationsIO.write_observations(observations.tolist(), path_to_file)
+    if not keep_shards:
+        for path_to_shard in paths_to_shards:
+            os.remove(path_to_shard)
+    return observations
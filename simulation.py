@@ -1,5 +1,26 @@
-from brian2 import *
+import sys
+#Brian2 imports pylab (and so matplotlib) whenever it can, which is most of its import time, while matplotlib is only needed for the raster plots. So, unless they were already imported (e.g. in a notebook), pylab and matplotlib are hidden while Brian2 is imported (it then only imports numpy), and plot_raster imports matplotlib itself.
+hidden_modules = [name for name in ['pylab', 'matplotlib'] if name not in sys.modules]
+for name in hidden_modules:
+    sys.modules[name] = None
+try:
+    from brian2 import *
+finally:
+    for name in hidden_modules:
+        del sys.modules[name]
+import numpy as np
+import os
+import time
+import gen_connections
+import instrumentation
 import observationsIO
+import plugin_entropy
+
+
+#Brian2 compiles the generated code of a model once and keeps the compiled extension in a cache on disk, which is shared by all Simulation instances and all processes (see sweep_runner). As the synapse weight and the connections are runtime variables (see build_network), Simulations that only differ by these, or by their number of neurons, reuse the same compiled code. The following puts this cache in 'path_to_dir', so that it can be kept with the observations of a sweep.
+def set_compile_cache(path_to_dir):
+    prefs.codegen.runtime.cython.cache_dir = path_to_dir
+    prefs.codegen.runtime.cython.multiprocess_safe = True
 
 
 class Simulation:
@@ -33,9 +54,24 @@ class Simulation:
              - 'duration': int, has to be a multiple of time_bin_size.
                  Be carefull wehen reducing this when stim =='on'.  
                  
+             - 'recording': string, either 'network_operation' or 'spikemon'. optional, default is 'network_operation'.
+                 If 'recording' == 'network_operation', the spikes are counted during the simulation by a counter that is read and reset at the end of every time bin. If 'recording' == 'spikemon', the spikes are recorded by a SpikeMonitor and binned once the run is over (see bin_spikes), which keeps Python out of the simulation loop. The observations are then an int array of shape (nb_bins, n_monte_carlo, stim+nb_neurons).
+                 
+             - 'con_type': string, optional, default is None.
+                 A description of the connections (for example a con_type of gen_connections). It is only used as metadata in binary observation files.
+                 
+             - 'seed': int, optional, default is None.
+                 If not None, the random number generators are seeded with 'seed' before simulating, so that a simulation can be reproduced. 
+                 
+             - 'instrument': bool, optional, default is False.
+                 If True, the wall time and number of calls of every phase of the simulation (building the network, code generation, restoring the network, the simulation loop, the update_time_bin callback, binning and writing the observations) are recorded, together with the number of trials, of spikes and of bytes written. See instrumentation_report.
+                 
+             - 'backend': string, either 'brian2' or 'numpy'. optional, default is 'brian2'.
+                 If 'backend' == 'numpy', the model is not simulated by Brian2 but integrated directly with numpy (see run_numpy): the same equations, with the same Euler-Maruyama scheme and order of updates, for all the trials at once. There is no code generation and no network to build, which makes it much faster for the small networks of the sweeps. 'recording' and 'batched' are then irrelevant, the observations are always an int array of shape (nb_bins, n_monte_carlo, stim+nb_neurons).
+                 
         The result of a simulation is an object, on which one can run several commands that are written below.
             """
-    def __init__(self, nb_neurons, synapse_weight, time_bin_size, pre_syn, pos_syn, name, neurtype ='regular spiking', stim='off', duration=1000):
+    def __init__(self, nb_neurons, synapse_weight, time_bin_size, pre_syn, pos_syn, name, neurtype ='regular spiking', stim='off', duration=1000, recording='network_operation', con_type=None, seed=None, instrument=False, backend='brian2'):
         # prefs.codegen.target = "numpy"
         defaultclock.dt = 1*ms
         self.nb_neurons = nb_neurons
@@ -43,8 +79,17 @@ class Simulation:
         self.time_bin_size = time_bin_size
         self.duration = duration
         self.nb_bins = duration//time_bin_size 
+        self.nb_steps = int(round(float(duration*ms/defaultclock.dt))) #number of time steps of a trial
         self.neurtype=neurtype
         self.name = name
+        self.pre_syn = pre_syn
+        self.pos_syn = pos_syn
+        self.recording = recording
+        self.con_type = con_type
+        self.seed = seed
+        self.instrumentation = instrumentation.get_instrumentation(instrument)
+        self.backend = backend
+        self.rng = np.random.default_rng(seed) #the random number generator of the numpy backend.
         
         #stim params: These matter only if stim is 'on'
         self.stim_neurons = stim  #should I only treat case where None?
@@ -84,6 +129,8 @@ class Simulation:
         else:
             print('unrecognized neuron type')
         
+        self.neuron_namespace = neuron_namespace
+        
         #The following code looks like the following comments:
         #model =\
         #'''
@@ -94,118 +141,448 @@ class Simulation:
         #'''
         
         if self.stim == 'off':
-            model =\
+            self.model =\
             '''
             dv/dt = (k*(v-vr)*(v-vt) - u + I)/(C*tau) + 5*xi*sqrt(1/tau): 1 
             du/dt = a*(b*(v - vr) - u)/tau : 1
             I = input_func(t) : 1
-            nb_spikes_in_bin : 1
             '''
         elif self.stim == 'on':
-            model =\
+            #'neuron_index' is the index of the neuron inside its own copy of the network, so that only neuron 0 of every copy is stimulated.
+            self.model =\
             '''
             dv/dt = (k*(v-vr)*(v-vt) - u + I)/(C*tau) + 5*xi*sqrt(1/tau): 1 
             du/dt = a*(b*(v - vr) - u)/tau : 1
-            I = input_func(t)*(i==0) : 1          
-            nb_spikes_in_bin : 1
+            I = input_func(t)*int(neuron_index==0) : 1          
+            neuron_index : integer (constant)
             '''
         else:
             print('Incorrect stim value. pick between "on" or "off".' )
             
+        if self.recording == 'network_operation':
+            self.model += 'nb_spikes_in_bin : 1\n'
+        elif self.recording != 'spikemon':
+            print('Incorrect recording value. pick between "network_operation" or "spikemon".')
+        
+        if self.backend not in ['brian2', 'numpy']:
+            print('Incorrect backend value. pick between "brian2" or "numpy".')
+        self.neurons, self.S, self.spikemon, self.network = None, None, None, None #the network of a single copy of the model, only built when it is first needed (see single_network).
+        self.batched_networks = {} #networks holding several copies of the model, indexed by their number of copies.
+        self.nb_trials = None #number of trials of the last simulation
+        
+#The following builds the neurons, synapses and monitors of 'nb_copies' independent copies of the network, stacked in a single NeuronGroup. Copy r holds the neurons r*nb_neurons, ..., (r+1)*nb_neurons-1 and its synapses are the ones given by pre_syn and pos_syn, shifted by r*nb_neurons. Each copy receives its own noise, so that one run of the network gives 'nb_copies' independent trials.
+    def build_network(self, nb_copies):
+        namespace = dict(self.neuron_namespace) #each network has its own namespace, as 'input_func' is changed before each run.
+        
         #reseting after a spike has occured:
         
         reset =\
         '''
-        nb_spikes_in_bin += 1
         v = c
         u += d
         '''
+        if self.recording == 'network_operation':
+            reset += 'nb_spikes_in_bin += 1\n'
         peak_threshold = 'v>vpeak' 
         
         #initialize the neurons
-        self.neurons = NeuronGroup(self.nb_neurons, model, threshold=peak_threshold, reset=reset,
-                         method='euler', namespace=neuron_namespace)
-        self.neurons.v = self.neurons.namespace['vr'] 
-        self.neurons.u = self.neurons.namespace['b']*self.neurons.v 
+        neurons = NeuronGroup(self.nb_neurons*nb_copies, self.model, threshold=peak_threshold, reset=reset,
+                         method='euler', namespace=namespace)
+        neurons.v = namespace['vr'] 
+        neurons.u = namespace['b']*neurons.v 
+        if self.stim == 'on':
+            neurons.neuron_index = np.tile(np.arange(self.nb_neurons), nb_copies)
         
         
         # Initialize the synapses
-        synapse_namespace = {'synapse_weight': synapse_weight} #synapse hyper parameter
-        self.S = Synapses(self.neurons, self.neurons, on_pre='v_post += synapse_weight', namespace=synapse_namespace) #creates the synapse type
+        #The weight is a per-synapse variable rather than a constant of the namespace, since constants are written into the generated code, which would then be compiled again for every synapse weight.
+        S = Synapses(neurons, neurons, model='w : 1', on_pre='v_post += w') #creates the synapse type
         
         #Initializes the connections:
-        self.S.connect(i=pre_syn,j=pos_syn)
-        #Be careful, self.S.connect(i=[], j=[]) makes full conn... Not no connections.
+        #Be careful, S.connect(i=[], j=[]) makes full conn... Not no connections.
+        if len(self.pre_syn) > 0:
+            offsets = np.repeat(np.arange(nb_copies)*self.nb_neurons, len(self.pre_syn)) #block diagonal connectivity
+            S.connect(i=np.tile(self.pre_syn, nb_copies) + offsets, j=np.tile(self.pos_syn, nb_copies) + offsets)
+            S.w = self.synapse_weight
+        else:
+            S.active = False
         
         
         # Network
-        self.spikemon = SpikeMonitor(self.neurons, record=True)
-        self.spikemon.active = False
+        spikemon = SpikeMonitor(neurons, record=True)
+        spikemon.active = (self.recording == 'spikemon')
+        
+        if self.recording == 'spikemon':
+            network = Network(neurons, S, spikemon)
+            network.store()
+            return neurons, S, spikemon, network
         
-        @network_operation(dt=time_bin_size*ms)
+        @network_operation(dt=self.time_bin_size*ms)
         def update_time_bin(t):
             if t/ms == 0:
                 return
             
-            if self.stim == 'on':
-                obs = tuple([self.neurons.namespace['input_func'](t-defaultclock.dt)] + list(self.neurons.nb_spikes_in_bin))
-            else:
-                obs = tuple(list(self.neurons.nb_spikes_in_bin)) #If stim =='off' then we only care about the neurons
-            bin_index = int((t/ms)/time_bin_size)
-            self.observations[bin_index-1].append(obs)
-            self.neurons.nb_spikes_in_bin = 0
+            with self.instrumentation.phase('update_time_bin'):
+                bin_index = int((t/ms)/self.time_bin_size)
+                spike_counts = np.reshape(neurons.nb_spikes_in_bin[:], (nb_copies, self.nb_neurons))
+                if self.instrumentation.enabled:
+                    self.instrumentation.count('spikes', int(spike_counts.sum()))
+                for copy_counts in spike_counts:
+                    if self.stim == 'on':
+                        obs = tuple([namespace['input_func'](t-defaultclock.dt)] + list(copy_counts))
+                    else:
+                        obs = tuple(list(copy_counts)) #If stim =='off' then we only care about the neurons
+                    self.observations[bin_index-1].append(obs)
+                neurons.nb_spikes_in_bin = 0
         
         
-        self.network = Network(self.neurons, self.S, update_time_bin, self.spikemon)
-        self.network.store()
+        network = Network(neurons, S, update_time_bin, spikemon)
+        network.store()
+        return neurons, S, spikemon, network
         
 #The following simulates the entire simulation n_monte_carlo times, and writes it down in the folder located in path_to_dir.
-    def simulate(self, n_monte_carlo, path_to_dir):
+#If 'batched' is True, the n_monte_carlo trials are simulated at once in a single network made of n_monte_carlo independent copies of the model (see build_network). This is much faster for small networks, and the observations written are laid out exactly as in the sequential case.
+#If 'cache' is a result_cache.ResultCache, the observations are taken from the cache when this exact configuration (see configuration) was already simulated, and stored in it otherwise.
+#If 'sink' is a streaming_it.StreamingIT, it is fed with the observations of each trial as soon as they are simulated. If moreover 'path_to_dir' is None (and there is no cache), no file is written and the observations are not kept, so that the memory used does not grow with n_monte_carlo.
+#If 'precision' is given, n_monte_carlo is only a budget: the trials are simulated by chunks of 'chunk_size' trials, and the simulation stops as soon as the estimation error (see plugin_entropy.estimation_error) of every 'monitored' measure is below 'precision' (in bits) in every time bin. The measures are given as in plugin_entropy.measure_terms, e.g. [('entropy', [0]), ('mutual_information', [0], [1])], and by default it is the entropy of neuron 0. The number of trials used is stored in self.nb_trials (and in the metadata of binary files).
+#If 'file_format' is 'spikes', every spike of every trial is recorded at the time step of the simulation (see run_spike_trials) and written in a spike file of observationsIO, which can be read with any time bin size that divides the duration (see observationsIO.read_observation_array). Its name has no time bin size: '{name}_nb_neur_{nb_neurons}_sw_{synapse_weight}_stim_{stim}_spikes'. The observations returned are still binned with self.time_bin_size. This cannot be combined with 'precision' or 'cache'.
+#The observations are returned.
+    def simulate(self, n_monte_carlo, path_to_dir, batched=False, file_format='text', cache=None, sink=None, precision=None, monitored=None, chunk_size=50):
         self.observations = [[] for bin_index in range(self.nb_bins)]
         
         if self.stim == 'on':
-            for _ in range(n_monte_carlo):
-                self.run_once('I_on')
-                
+            input_power = 'I_on'
         elif self.stim == 'off':
-            for _ in range(n_monte_carlo):
-                self.run_once('I_off')
+            input_power = 'I_off'
         else:
             print('Incorrect stim value. pick between "on" or "off".')
-            
+            return None
+        
+        if file_format == 'spikes' and (precision is not None or cache is not None):
+            print('Spike files cannot be written with "precision" or "cache".')
+            return None
+        
+        if precision is not None and monitored is None:
+            monitored = [('entropy', [1 if self.stim == 'on' else 0])]
+        
+        configuration = self.configuration(n_monte_carlo, batched)
+        if precision is not None:
+            configuration['adaptive'] = {'precision': precision, 'monitored': monitored, 'chunk_size': chunk_size}
+        if cache is not None and cache.lookup(configuration) is not None:
+            self.observations = cache.load(configuration, mmap=False)
+            self.nb_trials = self.observations.shape[1]
+            if sink is not None:
+                sink.update(self.observations)
+        else:
+            if self.seed is not None:
+                seed(self.seed)
+                self.rng = np.random.default_rng(self.seed)
+            if precision is not None:
+                self.run_adaptive_trials(input_power, n_monte_carlo, batched, sink, precision, monitored, chunk_size)
+            elif file_format == 'spikes':
+                self.run_spike_trials(input_power, n_monte_carlo, batched)
+                self.nb_trials = n_monte_carlo
+                if sink is not None:
+                    sink.update(self.observations)
+            else:
+                self.run_trials(input_power, n_monte_carlo, batched, sink, keep_observations=(path_to_dir is not None or cache is not None or sink is None))
+                self.nb_trials = n_monte_carlo
+            if cache is not None:
+                cache.store(configuration, self.observations, self.observation_metadata())
+        
+        if path_to_dir is None:
+            return self.observations
         #The following writes the file. Then file_name depends on almost all parameters of the model (exept connection types, duration...)
-        observationsIO.write_observations(
-            self.observations, path_to_dir+'{}_nb_neur_{}_sw_{}_tbs_{}_stim_{}'.format(self.name, self.nb_neurons, self.synapse_weight, self.time_bin_size, self.stim))
+        #With file_format == 'binary', the file is written in the binary format of observationsIO, which also stores the parameters of the simulation.
+        path_to_file = path_to_dir+'{}_nb_neur_{}_sw_{}_tbs_{}_stim_{}'.format(self.name, self.nb_neurons, self.synapse_weight, self.time_bin_size, self.stim)
+        if file_format == 'spikes':
+            path_to_file = path_to_dir+'{}_nb_neur_{}_sw_{}_stim_{}_spikes'.format(self.name, self.nb_neurons, self.synapse_weight, self.stim)
+        with self.instrumentation.phase('write_observations'):
+            if file_format == 'spikes':
+                observationsIO.write_spikes(path_to_file, **self.spike_record(input_power))
+            elif file_format == 'binary':
+                observationsIO.write_observations_binary(self.observations, path_to_file, self.observation_metadata())
+            else:
+                observationsIO.write_observations(self.observations, path_to_file)
+        if self.instrumentation.enabled:
+            self.instrumentation.count('bytes_written', os.path.getsize(path_to_file))
+        return self.observations
+    
+    def run_trials(self, input_power, n_monte_carlo, batched, sink=None, keep_observations=True):
+        self.instrumentation.count('trials', n_monte_carlo)
+        if self.backend == 'numpy':
+            self.observations = self.run_numpy(input_power, n_monte_carlo)
+            if sink is not None:
+                sink.update(self.observations)
+        elif batched:
+            self.run_batch(input_power, n_monte_carlo)
+            if self.recording == 'spikemon':
+                neurons, S, spikemon, network = self.batched_networks[n_monte_carlo]
+                self.observations = self.bin_spikes(neurons, spikemon, n_monte_carlo)
+            if sink is not None:
+                sink.update(self.observations)
+        else:
+            trials = []
+            for _ in range(n_monte_carlo):
+                self.run_once(input_power)
+                if self.recording == 'spikemon':
+                    trial = self.bin_spikes(self.neurons, self.spikemon, 1)
+                    if keep_observations:
+                        trials.append(trial)
+                else:
+                    trial = [[time_bin[-1]] for time_bin in self.observations] #the observations of the last trial, shape (nb_bins, 1, stim+nb_neurons)
+                    if not keep_observations:
+                        self.observations = [[] for bin_index in range(self.nb_bins)]
+                if sink is not None:
+                    sink.update(trial)
+            if self.recording == 'spikemon':
+                self.observations = np.concatenate(trials, axis=1) if keep_observations else None
+    
+    #Runs 'n_monte_carlo' trials and keeps every spike at the time step of the simulation in self.spike_events: the arrays of the trial, the time step and the neuron of each spike. With Brian2, the spikes are recorded by the SpikeMonitor, which is active during these runs whatever 'recording' is. The observations are then binned from these spikes.
+    def run_spike_trials(self, input_power, n_monte_carlo, batched):
+        self.instrumentation.count('trials', n_monte_carlo)
+        if self.backend == 'numpy':
+            self.run_numpy(input_power, n_monte_carlo, record_spikes=True)
+        elif batched:
+            if n_monte_carlo not in self.batched_networks:
+                with self.instrumentation.phase('build_network'):
+                    self.batched_networks[n_monte_carlo] = self.build_network(n_monte_carlo)
+            neurons, S, spikemon, network = self.batched_networks[n_monte_carlo]
+            spikemon.active = True
+            self.run_batch(input_power, n_monte_carlo)
+            spikemon.active = (self.recording == 'spikemon')
+            self.spike_events = self.recorded_spikes(spikemon, n_monte_carlo)
+        else:
+            self.single_network()
+            self.spikemon.active = True
+            events = []
+            for trial in range(n_monte_carlo):
+                self.run_once(input_power)
+                events.append(self.recorded_spikes(self.spikemon, 1, trial))
+            self.spikemon.active = (self.recording == 'spikemon')
+            self.spike_events = tuple(np.concatenate([event[axis] for event in events]) for axis in range(3))
+        if self.instrumentation.enabled and self.backend == 'brian2' and self.recording == 'spikemon':
+            self.instrumentation.count('spikes', len(self.spike_events[0])) #update_time_bin counts them otherwise
+        with self.instrumentation.phase('bin_spikes'):
+            self.observations = observationsIO.spikes_to_observations(self.spike_record(input_power, n_monte_carlo), self.time_bin_size)
+    
+    #The spikes recorded by 'spikemon' in the last run of a network of 'nb_copies' copies, as arrays of the trial (the copy, plus 'first_trial'), the time step and the neuron of each spike. As in count_spikes_in_bins, the spikes of the extra time step at t=duration are dropped.
+    def recorded_spikes(self, spikemon, nb_copies, first_trial=0):
+        steps = np.round(np.asarray(spikemon.t/defaultclock.dt)).astype(int)
+        in_duration = steps < self.nb_steps
+        indices = np.asarray(spikemon.i)[in_duration]
+        return indices//self.nb_neurons + first_trial, steps[in_duration], indices%self.nb_neurons
+    
+    #The spikes of the last run_spike_trials with the arguments of observationsIO.write_spikes, which is also the layout of observationsIO.read_spikes. The stimulus is the value of the input at every time step.
+    def spike_record(self, input_power, nb_trials=None):
+        trials, steps, neurons = self.spike_events
+        stimulus = np.asarray(self.neuron_namespace[input_power](np.arange(self.nb_steps)*defaultclock.dt)).astype(int) if self.stim == 'on' else np.zeros(0, dtype=int)
+        return {'trials': trials, 'steps': steps, 'neurons': neurons, 'nb_trials': nb_trials if nb_trials is not None else self.nb_trials,
+                'nb_neurons': self.nb_neurons, 'nb_steps': self.nb_steps, 'stimulus': stimulus, 'dt': float(defaultclock.dt/ms), 'metadata': self.observation_metadata()}
+    
+    def run_adaptive_trials(self, input_power, max_trials, batched, sink, precision, monitored, chunk_size):
+        chunks = []
+        self.nb_trials = 0
+        while self.nb_trials < max_trials:
+            nb_chunk_trials = min(chunk_size, max_trials - self.nb_trials)
+            self.observations = [[] for bin_index in range(self.nb_bins)]
+            self.run_trials(input_power, nb_chunk_trials, batched, sink)
+            chunks.append(np.asarray(self.observations))
+            self.nb_trials += nb_chunk_trials
+            
+            observations = np.concatenate(chunks, axis=1)
+            errors = [plugin_entropy.estimation_error(observations, measure) for measure in monitored]
+            if max(np.max(error) for error in errors) <= precision:
+                break
+        self.observations = np.concatenate(chunks, axis=1)
+    
+    #Everything that determines the result of simulate(n_monte_carlo, ..., batched): this is what result_cache uses as a key. The seed only matters when it is set, and then the batched and sequential modes draw different noise.
+    def configuration(self, n_monte_carlo, batched=False):
+        neuron_parameters = {name: float(value) for name, value in self.neuron_namespace.items() if not isinstance(value, TimedArray)}
+        return {'nb_neurons': int(self.nb_neurons), 'synapse_weight': float(self.synapse_weight), 'time_bin_size': int(self.time_bin_size),
+                'pre_syn': np.asarray(self.pre_syn, dtype=int).tolist(), 'pos_syn': np.asarray(self.pos_syn, dtype=int).tolist(),
+                'neurtype': self.neurtype, 'neuron_parameters': neuron_parameters, 'duration': int(self.duration),
+                'stim': self.stim, 'I_MAX': self.I_MAX, 'n_monte_carlo': int(n_monte_carlo),
+                'seed': self.seed, 'batched': bool(batched) if self.seed is not None else None,
+                'backend': self.backend if self.seed is not None else None}
+    
+    #The following change the synapse weight or the connections of the simulation without changing its model, so that no code has to be generated or compiled again. This is what consecutive points of a sweep usually differ by.
+    def set_synapse_weight(self, synapse_weight):
+        self.synapse_weight = synapse_weight
+        self.neuron_namespace['synapse_weight'] = synapse_weight
+        if self.backend == 'numpy':
+            return
+        networks = list(self.batched_networks.values())
+        if self.network is not None:
+            networks.append((self.neurons, self.S, self.spikemon, self.network))
+        for neurons, S, spikemon, network in networks:
+            network.restore()
+            if len(S) > 0:
+                S.w = synapse_weight
+            network.store()
+    
+    def set_connections(self, pre_syn, pos_syn):
+        self.pre_syn = pre_syn
+        self.pos_syn = pos_syn
+        self.neurons, self.S, self.spikemon, self.network = None, None, None, None
+        self.batched_networks = {}
+    
+    def observation_metadata(self):
+        return {'nb_neurons': self.nb_neurons, 'synapse_weight': self.synapse_weight, 'time_bin_size': self.time_bin_size,
+                'stim': self.stim, 'duration': self.duration, 'neurtype': self.neurtype, 'con_type': self.con_type,
+                'n_monte_carlo': self.nb_trials, 'backend': self.backend}
+    
+    #The network of a single copy of the model, which run_once uses. It is built the first time it is needed, as batched simulations never use it.
+    def single_network(self):
+        if self.network is None:
+            with self.instrumentation.phase('build_network'):
+                self.neurons, self.S, self.spikemon, self.network = self.build_network(1)
+        return self.neurons, self.S, self.spikemon, self.network
     
     def run_once(self, input_power):
-        self.network.restore()
+        self.single_network()
+        with self.instrumentation.phase('network_restore'):
+            self.network.restore()
         self.neurons.namespace['input_func'] = self.neurons.namespace[input_power] #changing the input_power function 
-        self.network.run(self.duration*ms + defaultclock.dt)
+        self.run_network(self.network)
+    
+    def run_batch(self, input_power, nb_copies):
+        if nb_copies not in self.batched_networks:
+            with self.instrumentation.phase('build_network'):
+                self.batched_networks[nb_copies] = self.build_network(nb_copies)
+        neurons, S, spikemon, network = self.batched_networks[nb_copies]
+        with self.instrumentation.phase('network_restore'):
+            network.restore()
+        neurons.namespace['input_func'] = neurons.namespace[input_power] #changing the input_power function 
+        self.run_network(network)
+    
+    #Brian2 generates (and, the first time, compiles) the code of the network at the beginning of every run, and then times the simulation loop itself in device._last_run_time. When instrumented, the rest of the run is recorded as 'codegen' and the loop as 'network_run' (which includes the calls of update_time_bin).
+    def run_network(self, network):
+        if not self.instrumentation.enabled:
+            network.run(self.duration*ms + defaultclock.dt)
+            return
+        start = time.perf_counter()
+        network.run(self.duration*ms + defaultclock.dt)
+        seconds = time.perf_counter() - start
+        self.instrumentation.add_time('codegen', seconds - device._last_run_time)
+        self.instrumentation.add_time('network_run', device._last_run_time)
+    
+    #The report of the instrumentation (see instrumentation.Instrumentation.report), with the mean number of spikes per trial. It is None if the Simulation was not created with instrument=True.
+    def instrumentation_report(self):
+        report = self.instrumentation.report()
+        if report is not None and report['counters'].get('trials', 0) > 0:
+            report['spikes_per_trial'] = report['counters'].get('spikes', 0)/report['counters']['trials']
+        return report
+    
+#The numpy backend. It integrates the model of self.model for 'nb_trials' trials at once, the state being arrays of shape (nb_trials, nb_neurons), exactly as Brian2 does with method='euler' and dt = 1ms: at every time step t,
+#    - the state is updated by Euler-Maruyama from the state at t: v += dt*(k*(v-vr)*(v-vt) - u + I(t))/(C*tau) + 5*sqrt(dt/tau)*xi and u += dt*a*(b*(v-vr) - u)/tau, where xi is a standard normal for each neuron and trial,
+#    - the neurons with v > vpeak spike, every synapse from a spiking neuron adds synapse_weight to the v of its post-synaptic neuron (through the sparse adjacency matrix of the connections, see gen_connections.adjacency),
+#    - and the spiking neurons are reset (v = c, u += d).
+#The spikes of the steps of each time bin are counted in place, and the output has the layout of bin_spikes: an int array of shape (nb_bins, nb_trials, stim+nb_neurons). If 'record_spikes' is True, every spike is also kept in self.spike_events, as arrays of the trial, time step and neuron of each spike (see run_spike_trials), and the spike times (in ms) and neuron indices of the first trial in self.example_spikes, for the raster plot.
+    def run_numpy(self, input_power, nb_trials, record_spikes=False):
+        with self.instrumentation.phase('numpy_run'):
+            namespace = self.neuron_namespace
+            a, b, c, d = namespace['a'], namespace['b'], namespace['c'], namespace['d']
+            vr, vt, vpeak, C, k = namespace['vr'], namespace['vt'], namespace['vpeak'], namespace['C'], namespace['k']
+            dt_over_tau = float(defaultclock.dt/namespace['tau'])
+            noise_scale = 5*np.sqrt(dt_over_tau)
+            nb_steps = self.nb_steps
+            steps_per_bin = int(round(float(self.time_bin_size*ms/defaultclock.dt)))
+            
+            inputs = np.asarray(namespace[input_power](np.arange(nb_steps)*defaultclock.dt), dtype=float)
+            stimulated = np.zeros(self.nb_neurons)
+            if self.stim == 'on':
+                stimulated[0] = 1 #only neuron 0 receives the stimulus, as in self.model
+            weights = (gen_connections.adjacency(self.pre_syn, self.pos_syn, self.nb_neurons)*float(self.synapse_weight)).T.tocsr() #weights[j, i] is the total weight from i to j
+            has_synapses = weights.nnz > 0
+            
+            v = np.full((nb_trials, self.nb_neurons), float(vr))
+            u = b*v
+            noise = np.empty_like(v)
+            spike_counts = np.zeros((self.nb_bins, nb_trials, self.nb_neurons), dtype=np.int64)
+            events = []
+            for step in range(nb_steps):
+                self.rng.standard_normal(out=noise)
+                dv = (k*(v - vr)*(v - vt) - u + inputs[step]*stimulated)*(dt_over_tau/C) + noise_scale*noise
+                u += dt_over_tau*a*(b*(v - vr) - u)
+                v += dv
+                
+                spiking = v > vpeak
+                spiking_trials = np.flatnonzero(spiking.any(axis=1))
+                if len(spiking_trials) == 0:
+                    continue
+                if has_synapses:
+                    v[spiking_trials] += (weights @ spiking[spiking_trials].T.astype(float)).T
+                v[spiking] = c
+                u[spiking] += d
+                spike_counts[step//steps_per_bin] += spiking
+                if record_spikes:
+                    spike_trials, spike_neurons = np.nonzero(spiking)
+                    events.append((spike_trials, np.full(len(spike_trials), step), spike_neurons))
+        
+        if record_spikes:
+            self.spike_events = tuple(np.concatenate([event[axis] for event in events]) if len(events) > 0 else np.zeros(0, dtype=int) for axis in range(3))
+            first_trial = self.spike_events[0] == 0
+            self.example_spikes = (self.spike_events[1][first_trial]*float(defaultclock.dt/ms), self.spike_events[2][first_trial])
+        if self.instrumentation.enabled:
+            self.instrumentation.count('spikes', int(spike_counts.sum()))
+        if self.stim == 'on':
+            stim_values = inputs[np.arange(1, self.nb_bins+1)*steps_per_bin - 1].astype(int) #the input at the end of each bin, as in update_time_bin
+            stim_column = np.broadcast_to(stim_values[:, None, None], (self.nb_bins, nb_trials, 1))
+            spike_counts = np.concatenate([stim_column, spike_counts], axis=2)
+        return spike_counts
+    
+#The following counts the spikes recorded by 'spikemon' in each time bin, for each of the 'nb_copies' copies of the network, with a single bincount. It outputs an int array of shape (nb_bins, nb_copies, stim+nb_neurons), where the stimulus column (when stim == 'on') holds the value of the input at the end of the bin, as in update_time_bin.
+    def bin_spikes(self, neurons, spikemon, nb_copies):
+        with self.instrumentation.phase('bin_spikes'):
+            spike_counts = self.count_spikes_in_bins(neurons, spikemon, nb_copies)
+        if self.instrumentation.enabled:
+            self.instrumentation.count('spikes', int(spike_counts[:, :, int(self.stim == 'on'):].sum()))
+        return spike_counts
+    
+    def count_spikes_in_bins(self, neurons, spikemon, nb_copies):
+        spike_steps = np.round(np.asarray(spikemon.t/defaultclock.dt)).astype(int)
+        spike_bins = spike_steps//self.time_bin_size 
+        in_duration = spike_bins < self.nb_bins #spikes in the extra time step at t=duration belong to no bin.
+        spike_indices = np.asarray(spikemon.i)[in_duration]
+        flat_indices = (spike_bins[in_duration]*nb_copies + spike_indices//self.nb_neurons)*self.nb_neurons + spike_indices%self.nb_neurons
+        spike_counts = np.bincount(flat_indices, minlength=self.nb_bins*nb_copies*self.nb_neurons).reshape(self.nb_bins, nb_copies, self.nb_neurons)
+        
+        if self.stim == 'on':
+            bin_ends = (np.arange(1, self.nb_bins+1)*self.time_bin_size)*ms - defaultclock.dt
+            stim_values = np.asarray(neurons.namespace['input_func'](bin_ends)).astype(int)
+            stim_column = np.broadcast_to(stim_values[:, None, None], (self.nb_bins, nb_copies, 1))
+            spike_counts = np.concatenate([stim_column, spike_counts], axis=2)
+        return spike_counts
     
 #This runs and plots a simulation. The plot is stored in path_to_file.
     def run_and_plot_example_raster(self, path_to_file):
+        input_power = 'I_on' if self.stim == 'on' else 'I_off'
+        if self.backend == 'numpy':
+            self.run_numpy(input_power, 1, record_spikes=True)
+            self.plot_raster(input_power, path_to_file, *self.example_spikes)
+            return
+        
         self.observations = [[] for bin_index in range(self.nb_bins)]
+        self.single_network()
         self.spikemon.active = True
+        self.run_once(input_power)
+        self.plot_raster(input_power, path_to_file)
+        self.spikemon.active = (self.recording == 'spikemon')
         
-        if self.stim == 'on':
-            self.run_once('I_on')
-            self.plot_raster('I_on', path_to_file)
-        else:
-            self.run_once('I_off')
-            self.plot_raster('I_off', path_to_file)
-        
-        self.spikemon.active = False
-        
-#This runs a simulation and produces the raster plot. The plot is stored in path_to_path_to_dir.  
-    def plot_raster(self, input_power, path_to_dir):
+#This runs a simulation and produces the raster plot. The plot is stored in path_to_path_to_dir. The spikes are the ones recorded by self.spikemon, unless their times (in ms) and neuron indices are given.
+    def plot_raster(self, input_power, path_to_dir, spike_times=None, spike_indices=None):
+        import matplotlib.pyplot as plt
+        if spike_times is None:
+            spike_times, spike_indices = self.spikemon.t/ms, self.spikemon.i
         plt_title = '{}_N_{}_sw_{}_tbs_{}_stim_{}'.format(self.name, self.nb_neurons, self.synapse_weight, self.time_bin_size, self.stim)
-        fig = figure(figsize=(15, 4))
-        title(plt_title)
-        plot(self.spikemon.t/ms, self.spikemon.i, '.k')
-        xlabel('Time (ms)')
-        ylabel('Neuron index')
-        yticks(arange(self.nb_neurons))
-        for t in arange(0, self.duration + 1, self.time_bin_size):
-            axvline(t, ls='--', c='C1', lw=1)
-        savefig(path_to_dir+plt_title+'.png')
+        fig = plt.figure(figsize=(15, 4))
+        plt.title(plt_title)
+        plt.plot(spike_times, spike_indices, '.k')
+        plt.xlabel('Time (ms)')
+        plt.ylabel('Neuron index')
+        plt.yticks(np.arange(self.nb_neurons))
+        for t in np.arange(0, self.duration + 1, self.time_bin_size):
+            plt.axvline(t, ls='--', c='C1', lw=1)
+        plt.savefig(path_to_dir+plt_title+'.png')
         plt.close('all')
\ No newline at end of file
@@ -0,0 +1,79 @@
+import numpy as np
+#Online accumulation of the information-theoretic quantities of a simulation, so that they can be computed without writing and reading back the observations (see Simulation.simulate(..., sink=...)).
+
+"""A StreamingIT keeps, for each time bin, the joint count table of the declared 'variables' (indices of the variables of the observations, the stimulus being variable 0 when stim == 'on'), together with the running mean and variance (Welford) of every variable, e.g. the firing rate of every neuron.
+It is fed with arrays of observations of shape (nb_bins, nb_trials, stim+nb_neurons), trial by trial or in chunks, and two StreamingITs of the same variables can be merged (e.g. the ones of several workers).
+The measures are the same as the ones of new_it_analyzer.IT_analyzer restricted to 'variables' (which are referred to by their index in the observations), and give the same values."""
+class StreamingIT:
+    def __init__(self, nb_time_bins, variables):
+        self.nb_time_bins = nb_time_bins
+        self.variables = list(variables)
+        self.nb_trials = 0
+        self.table = np.zeros((0, 1 + len(self.variables)), dtype=np.int64) #rows are (bin_index, values of the variables)
+        self.table_counts = np.zeros(0, dtype=np.int64)
+        self.means = None #shape (nb_time_bins, stim+nb_neurons)
+        self.M2 = None
+
+    def update(self, observations):
+        observations = np.asarray(observations)
+        nb_bins, nb_trials = observations.shape[:2]
+        if nb_trials == 0:
+            return
+        bin_indices = np.broadcast_to(np.arange(nb_bins)[:, None, None], (nb_bins, nb_trials, 1))
+        rows = np.concatenate([bin_indices, np.rint(observations[:, :, self.variables])], axis=2).reshape(-1, 1 + len(self.variables)).astype(np.int64)
+        rows, counts = np.unique(rows, axis=0, return_counts=True)
+        self.add_table(rows, counts)
+
+        chunk_means = observations.mean(axis=1)
+        chunk_M2 = ((observations - chunk_means[:, None, :])**2).sum(axis=1)
+        self.add_moments(nb_trials, chunk_means, chunk_M2)
+
+    def merge(self, other):
+        self.add_table(other.table, other.table_counts)
+        if other.nb_trials > 0:
+            self.add_moments(other.nb_trials, other.means, other.M2)
+
+    def add_table(self, rows, counts):
+        rows, inverse = np.unique(np.concatenate([self.table, rows]), axis=0, return_inverse=True)
+        self.table_counts = np.bincount(inverse.ravel(), weights=np.concatenate([self.table_counts, counts]), minlength=len(rows)).astype(np.int64)
+        self.table = rows
+
+    #Chan et al.'s formula to combine the running moments of two sets of trials.
+    def add_moments(self, nb_trials, means, M2):
+        if self.nb_trials == 0:
+            self.nb_trials, self.means, self.M2 = nb_trials, np.array(means, dtype=float), np.array(M2, dtype=float)
+            return
+        total = self.nb_trials + nb_trials
+        delta = means - self.means
+        self.means = self.means + delta*nb_trials/total
+        self.M2 = self.M2 + M2 + delta**2*self.nb_trials*nb_trials/total
+        self.nb_trials = total
+
+    #Mean and (unbiased) variance of every variable in each time bin, shape (nb_time_bins, stim+nb_neurons).
+    def firing_means(self):
+        return self.means
+
+    def firing_variances(self):
+        return self.M2/(self.nb_trials - 1)
+
+    #The following are the measures of IT_analyzer for all time bins, computed from the count tables. They return arrays of shape (nb_time_bins,).
+
+    def entropies(self, vars1):
+        if len(vars1) == 0 or self.nb_trials == 0:
+            return np.zeros(self.nb_time_bins)
+        columns = [0] + [1 + self.variables.index(var) for var in vars1]
+        keys, inverse = np.unique(self.table[:, columns], axis=0, return_inverse=True)
+        probabilities = np.bincount(inverse.ravel(), weights=self.table_counts, minlength=len(keys))/self.nb_trials
+        return -np.bincount(keys[:, 0], weights=probabilities*np.log2(probabilities), minlength=self.nb_time_bins)
+
+    def mutual_informations(self, vars1, vars2):
+        return self.entropies(vars1) + self.entropies(vars2) - self.entropies(list(vars1) + list(vars2))
+
+    def conditional_mutual_informations(self, vars1, vars2, cond):
+        return self.entropies(list(vars1) + list(cond)) + self.entropies(list(vars2) + list(cond)) - self.entropies(cond) - self.entropies(list(vars1) + list(vars2) + list(cond))
+
+    def NMIs(self, vars1, vars2):
+        return 2*self.mutual_informations(vars1, vars2)/(self.entropies(vars1) + self.entropies(vars2))
+
+    def NCMIs(self, vars1, vars2, cond):
+        return 2*self.conditional_mutual_informations(vars1, vars2, cond)/(self.entropies(vars1) + self.entropies(vars2))
@@ -0,0 +1,142 @@
+import json
+import os
+import time
+import traceback
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import instrumentation
+import observationsIO
+
+#Runs sweeps of simulations (as generated by generate_experiments) on a pool of processes, and keeps a manifest of the jobs so that an interrupted sweep can be resumed.
+
+"""A job is a dictionary with the following keys:
+    - 'simulation': dict, the keyword arguments of simulation.Simulation (nb_neurons, synapse_weight, time_bin_size, pre_syn, pos_syn, name, and optionally neurtype, stim, duration, ...).
+    - 'n_monte_carlo': int, the number of trials.
+    - 'path_to_dir': string, the directory in which the observations are written. It is created if it does not exist.
+    - 'raster': bool, optional, default is True. If True, an example raster plot is also stored in path_to_dir+'raster/'.
+    - 'simulate_kwargs': dict, optional, extra keyword arguments of Simulation.simulate (e.g. batched, file_format).
+    - 'compile_cache_dir': string, optional. If given, the compiled code of the model is cached in this directory (see simulation.set_compile_cache).
+    - 'instrument': bool, optional, default is False. If True, the simulation is instrumented (see Simulation(..., instrument=True)) and its report is returned by run_job.
+"""
+
+def make_job(path_to_dir, n_monte_carlo, raster=True, simulate_kwargs=None, **simulation_kwargs):
+    return {'simulation': simulation_kwargs, 'n_monte_carlo': n_monte_carlo, 'path_to_dir': path_to_dir,
+            'raster': raster, 'simulate_kwargs': simulate_kwargs if simulate_kwargs is not None else {}}
+
+#The file in which the observations of a job are written, see Simulation.simulate.
+def job_output(job):
+    sim = job['simulation']
+    if job.get('simulate_kwargs', {}).get('file_format') == 'spikes':
+        return job['path_to_dir'] + '{}_nb_neur_{}_sw_{}_stim_{}_spikes'.format(sim['name'], sim['nb_neurons'], sim['synapse_weight'], sim.get('stim', 'off'))
+    return job['path_to_dir'] + '{}_nb_neur_{}_sw_{}_tbs_{}_stim_{}'.format(
+        sim['name'], sim['nb_neurons'], sim['synapse_weight'], sim['time_bin_size'], sim.get('stim', 'off'))
+
+#A job is complete if its file of observations exists and holds the expected number of bins and of trials per bin (so that files cut by an interruption are simulated again). A spike file has to hold the expected duration and number of trials.
+def is_complete(job):
+    path_to_file = job_output(job)
+    if not os.path.isfile(path_to_file):
+        return False
+    sim = job['simulation']
+    nb_bins = sim.get('duration', 1000)//sim['time_bin_size']
+    try:
+        if observationsIO.is_spike_file(path_to_file):
+            header = observationsIO.read_spikes_header(path_to_file)
+            return header['nb_steps']*header['dt'] == sim.get('duration', 1000) and is_expected_nb_trials(job, header['nb_trials'])
+        if observationsIO.is_binary_observations(path_to_file):
+            header = observationsIO.read_binary_header(path_to_file)
+            nb_bytes = header['offset'] + int(np.prod(header['shape']))*np.dtype(header['dtype']).itemsize
+            return header['shape'][0] == nb_bins and is_expected_nb_trials(job, header['shape'][1]) and os.path.getsize(path_to_file) >= nb_bytes
+        observations = observationsIO.read_observations(path_to_file)
+    except (ValueError, IndexError, KeyError, UnicodeDecodeError, EOFError, zipfile.BadZipFile):
+        return False
+    return len(observations) == nb_bins and is_expected_nb_trials(job, len(observations[0])) and all(len(time_bin) == len(observations[0]) for time_bin in observations)
+
+#With an adaptive number of trials (Simulation.simulate(..., precision=...)), n_monte_carlo is only an upper bound.
+def is_expected_nb_trials(job, nb_trials):
+    if job.get('simulate_kwargs', {}).get('precision') is not None:
+        return 0 < nb_trials <= job['n_monte_carlo']
+    return nb_trials == job['n_monte_carlo']
+
+#Runs one job in the current process and returns its duration in seconds, and the report of its instrumentation (None if the job is not instrumented). Brian2 is only imported here, so that the workers import it themselves.
+def run_job(job):
+    import simulation
+    start = time.time()
+    if job.get('compile_cache_dir') is not None:
+        simulation.set_compile_cache(job['compile_cache_dir'])
+    os.makedirs(job['path_to_dir'], exist_ok=True)
+    ex = simulation.Simulation(instrument=job.get('instrument', False), **job['simulation'])
+    ex.simulate(job['n_monte_carlo'], job['path_to_dir'], **job.get('simulate_kwargs', {}))
+    report = ex.instrumentation_report() #taken before the raster, which is not part of the sweep's observations.
+    if job.get('raster', True):
+        os.makedirs(job['path_to_dir']+'raster/', exist_ok=True)
+        ex.run_and_plot_example_raster(job['path_to_dir']+'raster/')
+    return time.time() - start, report
+
+def load_manifest(path_to_manifest):
+    if not os.path.isfile(path_to_manifest):
+        return {}
+    with open(path_to_manifest, 'r') as file:
+        return json.load(file)
+
+def write_manifest(manifest, path_to_manifest):
+    directory = os.path.dirname(path_to_manifest)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path_to_manifest + '.tmp', 'w') as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    os.replace(path_to_manifest + '.tmp', path_to_manifest) #so that an interruption never leaves a broken manifest
+
+"""Runs all the jobs that are not complete yet on 'nb_workers' processes (the number of cores by default), and returns the manifest. The manifest, stored in 'path_to_manifest', maps the output file of each job to its status ('pending', 'done', 'skipped' or 'failed'), its duration in seconds, and the error if it failed. It is rewritten after every job, so re-running the same sweep after an interruption only runs the jobs that did not finish.
+With nb_workers == 1, the jobs are run one after the other in the current process.
+If 'compile_cache_dir' is given, all the workers share the compiled code of the model stored in this directory, so that it is only compiled once for the whole sweep.
+If 'path_to_log' is given, the simulations are instrumented, and for every job that is run a line {'job', 'status', 'seconds', 'simulation', 'report'} is appended to this JSON-lines file, where 'simulation' holds the parameters of the job (without its connections) and 'report' the report of its instrumentation (see Simulation.instrumentation_report)."""
+def run_sweep(jobs, path_to_manifest, nb_workers=None, compile_cache_dir=None, path_to_log=None):
+    manifest = load_manifest(path_to_manifest)
+    if compile_cache_dir is not None:
+        jobs = [dict(job, compile_cache_dir=compile_cache_dir) for job in jobs]
+    if path_to_log is not None:
+        jobs = [dict(job, instrument=True) for job in jobs]
+    to_run = []
+    for job in jobs:
+        job_id = job_output(job)
+        if is_complete(job):
+            if manifest.get(job_id, {}).get('status') != 'done':
+                manifest[job_id] = {'status': 'skipped', 'seconds': None}
+        else:
+            manifest[job_id] = {'status': 'pending', 'seconds': None}
+            to_run.append(job)
+    write_manifest(manifest, path_to_manifest)
+
+    def record(job, result=(None, None), error=None):
+        seconds, report = result
+        if error is None:
+            manifest[job_output(job)] = {'status': 'done', 'seconds': seconds}
+        else:
+            manifest[job_output(job)] = {'status': 'failed', 'seconds': None, 'error': error}
+            print('job {} failed:\n{}'.format(job_output(job), error))
+        write_manifest(manifest, path_to_manifest)
+        if path_to_log is not None:
+            parameters = {name: value for name, value in job['simulation'].items() if name not in ['pre_syn', 'pos_syn']}
+            instrumentation.append_to_log(path_to_log, {'job': job_output(job), 'status': manifest[job_output(job)]['status'], 'seconds': seconds,
+                                                        'simulation': parameters, 'report': report})
+
+    if nb_workers is None:
+        nb_workers = os.cpu_count() or 1
+    if nb_workers == 1:
+        for job in to_run:
+            try:
+                record(job, run_job(job))
+            except Exception:
+                record(job, error=traceback.format_exc())
+        return manifest
+
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        futures = {executor.submit(run_job, job): job for job in to_run}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                record(job, future.result())
+            except Exception:
+                record(job, error=traceback.format_exc())
+    return manifest